@@ -11,9 +11,12 @@ Run:
 from __future__ import annotations
 
 import argparse
+import json
+import shutil
+import tempfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -43,6 +46,8 @@ from sklearn.calibration import CalibratedClassifierCV
 from sklearn.inspection import permutation_importance
 import joblib
 
+from compiled_scorer import CompiledScorer
+
 
 @dataclass(frozen=True)
 class Config:
@@ -61,6 +66,7 @@ def load_data(path: str | Path, cfg: Config) -> pd.DataFrame:
 
 
 def add_features(df: pd.DataFrame) -> pd.DataFrame:
+    # compiled_scorer.add_features_record is the single-record version; keep them in sync
     df = df.copy()
     if "ApplicantIncome" in df.columns and "CoapplicantIncome" in df.columns:
         df["TotalIncome"] = df["ApplicantIncome"].fillna(0) + df["CoapplicantIncome"].fillna(0)
@@ -126,8 +132,10 @@ def get_models(random_state: int) -> Dict[str, object]:
     return models
 
 
-def make_pipeline(preprocessor: ColumnTransformer, model: object) -> Pipeline:
-    return Pipeline(steps=[("preprocess", preprocessor), ("model", model)])
+def make_pipeline(preprocessor: ColumnTransformer, model: object, memory: joblib.Memory | None = None) -> Pipeline:
+    # With `memory`, the fitted preprocessor and its transformed matrix are cached per
+    # training fold, so every model and hyperparameter candidate on that fold reuses them.
+    return Pipeline(steps=[("preprocess", preprocessor), ("model", model)], memory=memory)
 
 
 def cv_benchmark(
@@ -136,6 +144,7 @@ def cv_benchmark(
     preprocessor: ColumnTransformer,
     models: Dict[str, object],
     cfg: Config,
+    memory: joblib.Memory | None = None,
 ) -> pd.DataFrame:
     cv = StratifiedKFold(n_splits=cfg.cv_splits, shuffle=True, random_state=cfg.random_state)
     scoring = {
@@ -148,7 +157,7 @@ def cv_benchmark(
 
     rows = []
     for name, model in models.items():
-        pipe = make_pipeline(preprocessor, model)
+        pipe = make_pipeline(preprocessor, model, memory=memory)
         scores = cross_validate(pipe, X, y, cv=cv, scoring=scoring, n_jobs=-1, error_score="raise")
         row = {"model": name}
         for k, v in scores.items():
@@ -160,8 +169,18 @@ def cv_benchmark(
     return out
 
 
-def tune_logreg(X: pd.DataFrame, y: pd.Series, preprocessor: ColumnTransformer, cfg: Config) -> RandomizedSearchCV:
-    pipe = make_pipeline(preprocessor, LogisticRegression(max_iter=20000, class_weight="balanced", solver="lbfgs"))
+def tune_logreg(
+    X: pd.DataFrame,
+    y: pd.Series,
+    preprocessor: ColumnTransformer,
+    cfg: Config,
+    memory: joblib.Memory | None = None,
+) -> RandomizedSearchCV:
+    pipe = make_pipeline(
+        preprocessor,
+        LogisticRegression(max_iter=20000, class_weight="balanced", solver="lbfgs"),
+        memory=memory,
+    )
     param_distributions = {
         "model__C": np.logspace(-3, 3, 80),
     }
@@ -208,32 +227,88 @@ def fit_final_and_report(
     return report
 
 
+def threshold_curve(y_true: np.ndarray, proba: np.ndarray) -> pd.DataFrame:
+    """Precision, recall and F1 of `proba >= t` for every distinct probability `t`.
+
+    The probabilities are sorted once; true and false positives at every cut point are
+    cumulative sums over the sorted labels, so the curve is exact and costs O(n log n).
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    proba = np.asarray(proba, dtype=float)
+    if y_true.shape != proba.shape or y_true.ndim != 1:
+        raise ValueError(f"y_true and proba must be 1-D of the same length, got {y_true.shape} and {proba.shape}")
+    if proba.size == 0:
+        raise ValueError("Cannot compute a threshold curve without samples.")
+
+    order = np.argsort(-proba, kind="mergesort")
+    proba, y_true = proba[order], y_true[order]
+
+    # Last position of each distinct probability: predicting positive for proba >= t
+    # selects everything up to and including it
+    cut = np.r_[np.flatnonzero(np.diff(proba)), proba.size - 1]
+    tp = np.cumsum(y_true)[cut]
+    fp = (cut + 1) - tp
+    fn = y_true.sum() - tp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = tp / (tp + fp)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(tp > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+
+    curve = pd.DataFrame(
+        {"threshold": proba[cut], "precision": precision, "recall": recall, "f1": f1, "tp": tp, "fp": fp, "fn": fn}
+    )
+    return curve.iloc[::-1].reset_index(drop=True)
+
+
 def tune_threshold(y_true: np.ndarray, proba: np.ndarray, metric: str = "f1") -> Tuple[float, float]:
-    thresholds = np.linspace(0.05, 0.95, 91)
-    best_t, best_score = 0.5, -1.0
-
-    for t in thresholds:
-        pred = (proba >= t).astype(int)
-        if metric == "f1":
-            score = f1_score(y_true, pred, zero_division=0)
-        elif metric == "recall":
-            score = recall_score(y_true, pred, zero_division=0)
-        elif metric == "precision":
-            score = precision_score(y_true, pred, zero_division=0)
-        else:
-            raise ValueError("metric must be one of: f1, recall, precision")
-        if score > best_score:
-            best_t, best_score = float(t), float(score)
+    """Best `(threshold, score)` for `metric`; the full curve is `threshold_curve`."""
+    if metric not in ("f1", "recall", "precision"):
+        raise ValueError("metric must be one of: f1, recall, precision")
 
-    return best_t, best_score
+    curve = threshold_curve(y_true, proba)
+    # Ties go to the lowest threshold
+    best = int(np.argmax(curve[metric].to_numpy()))
+    return float(curve["threshold"].iloc[best]), float(curve[metric].iloc[best])
 
 
-def export_model(model: Pipeline, out_path: str | Path) -> None:
+def export_model(model: Pipeline, out_path: str | Path, metadata: Dict[str, Any] | None = None) -> None:
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     joblib.dump(model, out_path)
     print(f"\nSaved model to: {out_path.resolve()}")
 
+    # Decision threshold and input columns for the scoring service, next to the model
+    if metadata is not None:
+        meta_path = out_path.with_suffix(".json")
+        meta_path.write_text(json.dumps(metadata, indent=2))
+        print(f"Saved metadata to: {meta_path.resolve()}")
+
+
+def export_compiled(
+    model: Pipeline, out_path: str | Path, X_check: pd.DataFrame, threshold: float = 0.5, atol: float = 1e-9
+) -> CompiledScorer:
+    """Save a NumPy-only copy of a logistic regression pipeline next to `out_path` (`.npz`).
+
+    The compiled scorer must reproduce the pipeline's probabilities on `X_check`,
+    otherwise nothing is written.
+    """
+    compiled = CompiledScorer.from_pipeline(model, columns=list(X_check.columns), threshold=threshold)
+
+    expected = model.predict_proba(X_check)[:, 1]
+    actual = compiled.predict_proba(X_check.to_dict("records"))
+    max_diff = float(np.max(np.abs(actual - expected))) if len(expected) else 0.0
+    if max_diff > atol:
+        raise ValueError(f"Compiled scorer differs from the pipeline (max |diff| = {max_diff:.3g})")
+
+    npz_path = Path(out_path).with_suffix(".npz")
+    compiled.save(npz_path)
+    print(
+        f"Saved compiled scorer to: {npz_path.resolve()} "
+        f"({npz_path.stat().st_size / 1024:.1f} KiB, max |diff| on {len(expected)} rows = {max_diff:.2e})"
+    )
+    return compiled
+
 
 def main() -> None:
     parser = argparse.ArgumentParser()
@@ -242,6 +317,17 @@ def main() -> None:
     parser.add_argument("--no_tune", action="store_true", help="Skip hyperparameter tuning.")
     parser.add_argument("--calibrate", action="store_true", help="Calibrate probabilities (Platt scaling).")
     parser.add_argument("--threshold_metric", type=str, default="f1", choices=["f1", "precision", "recall"])
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Also save a NumPy-only scorer (.npz) of the logistic regression model, see compiled_scorer.py.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Directory for cached per-fold preprocessing (default: a temporary directory removed at exit).",
+    )
     args = parser.parse_args()
 
     cfg = Config()
@@ -256,23 +342,33 @@ def main() -> None:
 
     preprocessor, _, _ = build_preprocessor(X_train)
 
-    models = get_models(cfg.random_state)
-    bench = cv_benchmark(X_train, y_train, preprocessor, models, cfg)
-    print("\n=== Cross-Validation Benchmark (train split) ===")
-    print(bench.to_string(index=False))
-
-    if args.no_tune:
-        top_name = str(bench.iloc[0]["model"])
-        best_model = make_pipeline(preprocessor, models[top_name])
-        best_model.fit(X_train, y_train)
-        best_estimator = best_model
-        print(f"\nSelected (no-tune): {top_name}")
-    else:
-        search = tune_logreg(X_train, y_train, preprocessor, cfg)
-        best_estimator = search.best_estimator_
-        print("\n=== Logistic Regression Tuning (ROC-AUC) ===")
-        print("Best params:", search.best_params_)
-        print("Best CV ROC-AUC:", search.best_score_)
+    # The benchmark and the tuning search use the same folds: each fold's preprocessing
+    # is fitted once and shared by all models and all C candidates.
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="loan_pipeline_")
+    memory = joblib.Memory(cache_dir, verbose=0)
+
+    try:
+        models = get_models(cfg.random_state)
+        bench = cv_benchmark(X_train, y_train, preprocessor, models, cfg, memory=memory)
+        print("\n=== Cross-Validation Benchmark (train split) ===")
+        print(bench.to_string(index=False))
+
+        if args.no_tune:
+            top_name = str(bench.iloc[0]["model"])
+            best_model = make_pipeline(preprocessor, models[top_name])
+            best_model.fit(X_train, y_train)
+            best_estimator = best_model
+            print(f"\nSelected (no-tune): {top_name}")
+        else:
+            search = tune_logreg(X_train, y_train, preprocessor, cfg, memory=memory)
+            # The exported model must not refer to the cache directory
+            best_estimator = search.best_estimator_.set_params(memory=None)
+            print("\n=== Logistic Regression Tuning (ROC-AUC) ===")
+            print("Best params:", search.best_params_)
+            print("Best CV ROC-AUC:", search.best_score_)
+    finally:
+        if args.cache_dir is None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
 
     if args.calibrate:
         calibrated = CalibratedClassifierCV(best_estimator, method="sigmoid", cv=3)
@@ -290,7 +386,7 @@ def main() -> None:
     pred_tuned = (proba >= best_t).astype(int)
 
     print(f"\n=== Threshold Tuning ({args.threshold_metric}) ===")
-    print(f"Best threshold: {best_t:.2f} | Best {args.threshold_metric}: {best_s:.4f}")
+    print(f"Best threshold: {best_t:.4f} | Best {args.threshold_metric}: {best_s:.4f}")
     print("Confusion Matrix (tuned):\n", confusion_matrix(y_test, pred_tuned))
 
 
@@ -318,7 +414,18 @@ def main() -> None:
     print(imp.to_string(index=False))
 
 
-    export_model(final_model, args.out)
+    metadata = {
+        "threshold": best_t,
+        "threshold_metric": args.threshold_metric,
+        "columns": list(X_train.columns),
+    }
+    export_model(final_model, args.out, metadata=metadata)
+
+    if args.compile:
+        try:
+            export_compiled(final_model, args.out, X_test, threshold=best_t)
+        except ValueError as exc:
+            print(f"\nCompiled scorer not saved: {exc}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+"""
+Compiled Loan Scorer
+--------------------
+NumPy-only inference for the tuned logistic regression pipeline.
+
+Once fitted, the pipeline is just imputation constants, scaling, one-hot lookups
+and a dot product. `CompiledScorer.from_pipeline` reads those arrays out of the
+fitted `Pipeline(preprocess, LogisticRegression)` and `save` stores them in a
+small `.npz` file next to the joblib model. Loading and scoring need only NumPy,
+so scoring hosts do not need scikit-learn or pandas, and a single application
+is scored in microseconds.
+
+Usage:
+    scorer = CompiledScorer.load("models/loan_model.npz")
+    scorer.score_one({"Gender": "Male", "ApplicantIncome": 5849, ...})
+    scorer.predict_proba([{...}, {...}])
+"""
+
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _to_float(value: Any) -> float:
+    return math.nan if value is None else float(value)
+
+
+def add_features_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """`add_features` for a single application given as a dict (no DataFrame)."""
+    record = dict(record)
+    if "ApplicantIncome" in record and "CoapplicantIncome" in record:
+        incomes = (_to_float(record["ApplicantIncome"]), _to_float(record["CoapplicantIncome"]))
+        record["TotalIncome"] = sum(0.0 if math.isnan(v) else v for v in incomes)
+    if "LoanAmount" in record and "TotalIncome" in record:
+        denom = _to_float(record["TotalIncome"])
+        record["LoanAmount_to_Income"] = _to_float(record["LoanAmount"]) / denom if denom else math.nan
+    return record
+
+
+class RowPreprocessor:
+    """Applies a fitted `build_preprocessor` ColumnTransformer to dict records.
+
+    Only the structure built by `build_preprocessor` is supported (median imputer +
+    scaler for numbers, most-frequent imputer + one-hot for categories); use
+    `from_pipeline`, which returns None for anything else.
+    """
+
+    def __init__(
+        self,
+        numeric_cols: List[str],
+        medians: np.ndarray,
+        means: np.ndarray,
+        scales: np.ndarray,
+        categorical_cols: List[str],
+        fill_values: List[Any],
+        categories: List[List[Any]],
+    ) -> None:
+        self.numeric_cols = numeric_cols
+        self.medians = medians
+        self.means = means
+        self.scales = scales
+        self.categorical_cols = categorical_cols
+        self.fill_values = fill_values
+        self.categories = categories
+        self.category_index = [{c: i for i, c in enumerate(cats)} for cats in categories]
+        self.n_features = len(numeric_cols) + sum(len(cats) for cats in categories)
+
+    @classmethod
+    def from_pipeline(cls, pipeline: Any) -> RowPreprocessor | None:
+        # scikit-learn is only needed to compile, not to score
+        from sklearn.compose import ColumnTransformer
+        from sklearn.impute import SimpleImputer
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        if not isinstance(pipeline, Pipeline) or "preprocess" not in pipeline.named_steps:
+            return None
+        preprocess = pipeline.named_steps["preprocess"]
+        if not isinstance(preprocess, ColumnTransformer):
+            return None
+
+        fitted = [(name, trans, cols) for name, trans, cols in preprocess.transformers_ if trans != "drop"]
+        if [name for name, _, _ in fitted] != ["num", "cat"]:
+            return None
+        (_, num_pipe, numeric_cols), (_, cat_pipe, categorical_cols) = fitted
+
+        num_imputer, scaler = (step for _, step in num_pipe.steps)
+        cat_imputer, onehot = (step for _, step in cat_pipe.steps)
+        supported = (
+            isinstance(num_imputer, SimpleImputer)
+            and isinstance(scaler, StandardScaler)
+            and isinstance(cat_imputer, SimpleImputer)
+            and isinstance(onehot, OneHotEncoder)
+            and onehot.handle_unknown == "ignore"
+            and onehot.drop is None
+            and getattr(onehot, "_infrequent_enabled", False) is False
+            # All-missing training columns are dropped by SimpleImputer
+            and not np.isnan(num_imputer.statistics_.astype(float)).any()
+            and not any(_is_missing(v) for v in cat_imputer.statistics_)
+        )
+        if not supported:
+            return None
+
+        return cls(
+            list(numeric_cols),
+            num_imputer.statistics_.astype(float),
+            scaler.mean_ if scaler.with_mean else np.zeros(len(numeric_cols)),
+            scaler.scale_ if scaler.with_std else np.ones(len(numeric_cols)),
+            list(categorical_cols),
+            list(cat_imputer.statistics_),
+            [list(cats) for cats in onehot.categories_],
+        )
+
+    def transform(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        rows = np.zeros((len(records), self.n_features))
+
+        numbers = np.array([[_to_float(r.get(c)) for c in self.numeric_cols] for r in records], dtype=float)
+        numbers = numbers.reshape(len(records), len(self.numeric_cols))
+        numbers = np.where(np.isnan(numbers), self.medians, numbers)
+        rows[:, : len(self.numeric_cols)] = (numbers - self.means) / self.scales
+
+        offset = len(self.numeric_cols)
+        for col, fill, index in zip(self.categorical_cols, self.fill_values, self.category_index):
+            for i, record in enumerate(records):
+                value = record.get(col)
+                if _is_missing(value):
+                    value = fill
+                position = index.get(value)
+                # Unknown categories encode as all zeros (handle_unknown="ignore")
+                if position is not None:
+                    rows[i, offset + position] = 1.0
+            offset += len(index)
+
+        return rows
+
+
+class CompiledScorer:
+    """Preprocessing constants and logistic regression weights of a fitted pipeline."""
+
+    def __init__(
+        self,
+        columns: List[str],
+        preprocessor: RowPreprocessor,
+        coef: np.ndarray,
+        intercept: float,
+        threshold: float = 0.5,
+    ) -> None:
+        self.columns = columns
+        self.preprocessor = preprocessor
+        self.coef = coef
+        self.intercept = intercept
+        self.threshold = threshold
+
+    @classmethod
+    def from_pipeline(
+        cls, pipeline: Any, columns: List[str] | None = None, threshold: float = 0.5
+    ) -> CompiledScorer:
+        """Compile a fitted `Pipeline(preprocess, LogisticRegression)`; ValueError for anything else."""
+        from sklearn.linear_model import LogisticRegression
+
+        preprocessor = RowPreprocessor.from_pipeline(pipeline)
+        model = pipeline.named_steps.get("model") if preprocessor is not None else None
+        if not isinstance(model, LogisticRegression):
+            raise ValueError("Only Pipeline(build_preprocessor, LogisticRegression) models can be compiled.")
+        if list(model.classes_) != [0, 1]:
+            raise ValueError(f"Expected binary classes [0, 1], got {list(model.classes_)}")
+
+        if columns is None:
+            columns = list(pipeline.feature_names_in_)
+        return cls(list(columns), preprocessor, model.coef_[0].astype(float), float(model.intercept_[0]), threshold)
+
+    def transform(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        # Fields an application does not have are missing values
+        records = [add_features_record({c: r.get(c) for c in self.columns}) for r in records]
+        return self.preprocessor.transform(records)
+
+    def predict_proba(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """Probability of approval (`Loan_Status == "Y"`) for every record."""
+        z = self.transform(records) @ self.coef + self.intercept
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def score_one(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        proba = float(self.predict_proba([record])[0])
+        return {"probability": proba, "decision": "Y" if proba >= self.threshold else "N", "threshold": self.threshold}
+
+    def save(self, path: str | Path) -> None:
+        pre = self.preprocessor
+        if not all(isinstance(c, str) for cats in pre.categories for c in cats):
+            raise ValueError("Only string categories can be saved.")
+        np.savez(
+            path,
+            columns=np.array(self.columns, dtype=str),
+            numeric_cols=np.array(pre.numeric_cols, dtype=str),
+            medians=pre.medians,
+            means=pre.means,
+            scales=pre.scales,
+            categorical_cols=np.array(pre.categorical_cols, dtype=str),
+            fill_values=np.array(pre.fill_values, dtype=str),
+            categories=np.array([c for cats in pre.categories for c in cats], dtype=str),
+            category_sizes=np.array([len(cats) for cats in pre.categories], dtype=np.int64),
+            coef=self.coef,
+            intercept=np.array(self.intercept),
+            threshold=np.array(self.threshold),
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> CompiledScorer:
+        with np.load(path, allow_pickle=False) as data:
+            sizes = data["category_sizes"]
+            split = np.split(data["categories"], np.cumsum(sizes)[:-1]) if len(sizes) else []
+            categories = [[str(c) for c in cats] for cats in split]
+            preprocessor = RowPreprocessor(
+                [str(c) for c in data["numeric_cols"]],
+                data["medians"],
+                data["means"],
+                data["scales"],
+                [str(c) for c in data["categorical_cols"]],
+                [str(v) for v in data["fill_values"]],
+                categories,
+            )
+            return cls(
+                [str(c) for c in data["columns"]],
+                preprocessor,
+                data["coef"],
+                float(data["intercept"]),
+                float(data["threshold"]),
+            )
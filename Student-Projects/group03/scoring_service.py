@@ -0,0 +1,199 @@
+"""
+Loan Scoring Service
+--------------------
+Local HTTP service that scores loan applications with a model exported by
+`advanced_loan_pipeline.py`. The model is loaded once; every request applies the
+same feature engineering as training and the tuned decision threshold saved next
+to the model (`models/loan_model.json`).
+
+Single applications skip pandas entirely: the fitted imputers, scaler and
+one-hot encoder are read out of the pipeline once and applied to the JSON
+record directly (for logistic regression the whole model is compiled, see
+`compiled_scorer.py`), which keeps per-request latency well under a
+millisecond of model time. Batches (and models of another shape, e.g.
+calibrated ones) go through the regular DataFrame + ColumnTransformer path.
+
+Run:
+    python scoring_service.py --model models/loan_model.joblib --port 8000
+
+Requests:
+    POST /score   {"Gender": "Male", "ApplicantIncome": 5849, ...}
+              ->  {"probability": 0.83, "decision": "Y", "threshold": 0.45}
+    POST /score   [{...}, {...}]  or  {"applications": [{...}, {...}]}
+              ->  {"results": [{...}, {...}]}
+    GET  /health  ->  {"status": "ok", "threshold": 0.45, "fast_path": true}
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import joblib
+
+from advanced_loan_pipeline import add_features
+from compiled_scorer import CompiledScorer, RowPreprocessor, add_features_record
+
+
+class LoanScorer:
+    """Scores loan applications (dicts of raw fields) with an exported pipeline."""
+
+    def __init__(self, model: Any, threshold: float = 0.5, columns: List[str] | None = None) -> None:
+        self.model = model
+        self.threshold = threshold
+        self.columns = columns if columns is not None else list(getattr(model, "feature_names_in_", []))
+        self.fast = RowPreprocessor.from_pipeline(model)
+        if self.fast is not None and not self._fast_path_matches():
+            self.fast = None
+
+        # Logistic regression is scored without sklearn at all
+        self.compiled = None
+        if self.fast is not None:
+            try:
+                self.compiled = CompiledScorer.from_pipeline(model, self.columns, threshold)
+            except ValueError:
+                pass
+
+    @classmethod
+    def load(cls, model_path: str | Path, threshold: float | None = None) -> LoanScorer:
+        model_path = Path(model_path)
+        model = joblib.load(model_path)
+
+        meta_path = model_path.with_suffix(".json")
+        metadata = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        if threshold is None:
+            threshold = float(metadata.get("threshold", 0.5))
+        return cls(model, threshold=threshold, columns=metadata.get("columns"))
+
+    def score_one(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        if self.compiled is not None:
+            return self._result(float(self.compiled.predict_proba([record])[0]))
+        if self.fast is None:
+            return self.score_batch([record])[0]
+
+        # Fields the application does not have are missing, as in score_batch
+        record = {c: record.get(c) for c in self.columns}
+        row = self.fast.transform([add_features_record(record)])
+        proba = float(self.model.named_steps["model"].predict_proba(row)[0, 1])
+        return self._result(proba)
+
+    def score_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not records:
+            return []
+        # Reindex first: engineered features must not depend on the other records of the batch
+        X = self._frame(records)
+        X = add_features(X)
+        proba = self.model.predict_proba(X)[:, 1]
+        return [self._result(float(p)) for p in proba]
+
+    def _frame(self, records: List[Dict[str, Any]]) -> pd.DataFrame:
+        # JSON null arrives as None, which SimpleImputer does not treat as missing in
+        # object columns; NaN is imputed as in training (all-null columns become float)
+        X = pd.DataFrame(records, columns=self.columns)
+        return X.astype(object).where(X.notna(), np.nan).infer_objects()
+
+    def _result(self, proba: float) -> Dict[str, Any]:
+        return {
+            "probability": proba,
+            "decision": "Y" if proba >= self.threshold else "N",
+            "threshold": self.threshold,
+        }
+
+    def _fast_path_matches(self) -> bool:
+        # Guard against preprocessing details the row path does not reproduce: one
+        # all-missing record and one with the training medians and most frequent categories
+        missing = {c: None for c in self.columns}
+        typical = dict(zip(self.fast.numeric_cols, self.fast.medians.tolist()))
+        typical.update(zip(self.fast.categorical_cols, self.fast.fill_values))
+        probes = [missing, {**missing, **typical}]
+
+        X = self._frame(probes)
+        expected = self.model.named_steps["preprocess"].transform(X)
+        actual = self.fast.transform(probes)
+        return np.allclose(actual, expected)
+
+
+def _handler(scorer: LoanScorer) -> type:
+    class ScoringHandler(BaseHTTPRequestHandler):
+        # Keep-alive: clients reuse one connection instead of reconnecting per request
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate small writes; without TCP_NODELAY every
+        # response waits for the client's delayed ACK (~40 ms)
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            if self.path != "/health":
+                self._send(404, {"error": "not found"})
+                return
+            self._send(200, {"status": "ok", "threshold": scorer.threshold, "fast_path": scorer.fast is not None})
+
+        def do_POST(self) -> None:
+            if self.path != "/score":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                if isinstance(payload, dict) and "applications" in payload:
+                    payload = payload["applications"]
+                if isinstance(payload, list):
+                    body = {"results": scorer.score_batch(payload)}
+                elif isinstance(payload, dict):
+                    body = scorer.score_one(payload)
+                else:
+                    raise ValueError("expected an application object or a list of them")
+            except (ValueError, TypeError, KeyError) as exc:
+                self._send(400, {"error": str(exc)})
+                return
+            self._send(200, body)
+
+        def _send(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # One stderr line per request would dominate the latency
+            pass
+
+    return ScoringHandler
+
+
+def serve(scorer: LoanScorer, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _handler(scorer))
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, default="models/loan_model.joblib", help="Path to the exported model.")
+    parser.add_argument("--threshold", type=float, default=None, help="Override the threshold saved with the model.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    scorer = LoanScorer.load(args.model, threshold=args.threshold)
+    server = serve(scorer, args.host, args.port)
+    print(
+        f"Scoring on http://{args.host}:{args.port}/score "
+        f"(threshold={scorer.threshold:.4f}, fast path: {'on' if scorer.fast is not None else 'off'})"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Streaming (Out-of-Core) Loan Pipeline
+-------------------------------------
+Trains and scores the loan model on files that do not fit in memory. The file is
+read in chunks (CSV) or record batches (Parquet); no stage holds more than one
+chunk of rows.
+
+Training makes one statistics pass and `--epochs` learning passes:
+1. Statistics: mean and variance of every numeric column (Welford/Chan updates),
+   its median from a fixed-size reservoir sample (exact while the column has
+   fewer values than the reservoir), category counts and label counts. These
+   give the same imputation, scaling and one-hot constants as `build_preprocessor`.
+2. Learning: every chunk is encoded with those constants and fed to
+   `SGDClassifier(loss="log_loss").partial_fit`, with balanced class weights
+   from the label counts, a decaying learning rate and averaged weights.
+   A fixed random share of rows is held out; after the last epoch a separate
+   pass scores it with the final model for ROC-AUC and the tuned threshold.
+
+The result is a linear model, saved in the `compiled_scorer.py` format (`.npz`), so
+it is scored with NumPy only, by `CompiledScorer` or chunk by chunk by `score`.
+
+Run:
+    python streaming_pipeline.py train --data loans.csv --out models/loan_sgd.npz
+    python streaming_pipeline.py score --model models/loan_sgd.npz --data new_loans.csv --out scores.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import roc_auc_score
+
+from advanced_loan_pipeline import Config, add_features, split_xy, tune_threshold
+from compiled_scorer import CompiledScorer, RowPreprocessor
+
+
+@dataclass(frozen=True)
+class StreamConfig:
+    chunk_size: int = 100_000
+    schema_rows: int = 10_000
+    epochs: int = 5
+    holdout: float = 0.2
+    reservoir_size: int = 100_000
+    alpha: float = 1e-4
+    eta0: float = 0.01
+    random_state: int = 42
+
+
+def infer_categorical(path: str | Path, cfg: Config, stream_cfg: StreamConfig) -> List[str]:
+    """Raw columns read as text (categorical), judged from the first `schema_rows` rows."""
+    sample = next(iter_chunks(path, stream_cfg.schema_rows))
+    features = sample.drop(columns=[c for c in (cfg.id_col, cfg.target_col) if c in sample.columns])
+    return [c for c in features.columns if not pd.api.types.is_numeric_dtype(features[c])]
+
+
+def iter_chunks(
+    path: str | Path, chunk_size: int, categorical_cols: List[str] | None = None
+) -> Iterator[pd.DataFrame]:
+    """Yield the rows of a CSV or Parquet file as DataFrames of at most `chunk_size` rows.
+
+    Categorical columns are read as text in every chunk, so a chunk whose values all
+    look numeric (e.g. `Dependents`) is encoded like the others.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Reading Parquet requires: pip install pyarrow") from exc
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            for c in categorical_cols or []:
+                chunk[c] = chunk[c].astype(object).where(chunk[c].notna(), None)
+            yield chunk
+        return
+
+    dtype = {c: str for c in categorical_cols or []}
+    yield from pd.read_csv(path, chunksize=chunk_size, dtype=dtype)
+
+
+def iter_split_chunks(
+    path: str | Path, categorical_cols: List[str], cfg: Config, stream_cfg: StreamConfig
+) -> Iterator[Tuple[pd.DataFrame, pd.Series, np.ndarray]]:
+    """Yield `(X, y, held)` per chunk, where `held` marks the holdout rows.
+
+    The mask is drawn from a generator seeded with `random_state` on every call, so
+    each pass over the file holds out the same rows.
+    """
+    rng = np.random.default_rng(stream_cfg.random_state)
+    for chunk in iter_chunks(path, stream_cfg.chunk_size, categorical_cols):
+        X, y = split_xy(add_features(chunk), cfg)
+        yield X, y, rng.random(len(X)) < stream_cfg.holdout
+
+
+class RunningMoments:
+    """Count, mean and sum of squared deviations, merged chunk by chunk (Chan et al.)."""
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values: np.ndarray) -> None:
+        if len(values):
+            mean = float(values.mean())
+            self.merge(len(values), mean, float(((values - mean) ** 2).sum()))
+
+    def merge(self, n: int, mean: float, m2: float) -> None:
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.n * n / total
+        self.n = total
+
+
+class Reservoir:
+    """Uniform fixed-size sample of a value stream (Algorithm R)."""
+
+    def __init__(self, size: int, rng: np.random.Generator) -> None:
+        self.size = size
+        self.rng = rng
+        self.values = np.empty(size)
+        self.seen = 0
+
+    def update(self, values: np.ndarray) -> None:
+        free = max(0, min(self.size - self.seen, len(values)))
+        self.values[self.seen : self.seen + free] = values[:free]
+
+        rest = values[free:]
+        if len(rest):
+            # The i-th value of the stream replaces a random slot with probability size / (i + 1)
+            positions = self.seen + free + np.arange(len(rest))
+            slots = self.rng.integers(0, positions + 1)
+            keep = slots < self.size
+            self.values[slots[keep]] = rest[keep]
+        self.seen += len(values)
+
+    def median(self) -> float:
+        return float(np.median(self.values[: min(self.seen, self.size)]))
+
+
+@dataclass
+class StreamStats:
+    columns: List[str]
+    numeric_cols: List[str]
+    categorical_cols: List[str]
+    preprocessor: RowPreprocessor
+    label_counts: Dict[int, int]
+
+    def class_weight(self) -> Dict[int, float]:
+        # Same as class_weight="balanced": n_samples / (n_classes * count)
+        total = sum(self.label_counts.values())
+        return {label: total / (len(self.label_counts) * count) for label, count in self.label_counts.items()}
+
+
+def collect_stats(
+    path: str | Path, categorical_cols: List[str], cfg: Config, stream_cfg: StreamConfig
+) -> StreamStats:
+    """First pass: preprocessing constants and label counts of the training rows.
+
+    Holdout rows are skipped, so nothing learned from them reaches the model.
+    """
+    rng = np.random.default_rng(stream_cfg.random_state)
+    columns: List[str] | None = None
+    numeric_cols: List[str] = []
+    moments: Dict[str, RunningMoments] = {}
+    reservoirs: Dict[str, Reservoir] = {}
+    missing: Dict[str, int] = {}
+    counts: Dict[str, Counter] = {c: Counter() for c in categorical_cols}
+    label_counts: Counter = Counter()
+
+    for X, y, held in iter_split_chunks(path, categorical_cols, cfg, stream_cfg):
+        X, y = X[~held], y[~held]
+        if columns is None:
+            columns = list(X.columns)
+            numeric_cols = [c for c in columns if c not in categorical_cols]
+            moments = {c: RunningMoments() for c in numeric_cols}
+            reservoirs = {c: Reservoir(stream_cfg.reservoir_size, rng) for c in numeric_cols}
+            missing = {c: 0 for c in numeric_cols}
+
+        for c in numeric_cols:
+            values = pd.to_numeric(X[c], errors="coerce").to_numpy(dtype=float)
+            observed = values[~np.isnan(values)]
+            moments[c].update(observed)
+            reservoirs[c].update(observed)
+            missing[c] += len(values) - len(observed)
+        for c in categorical_cols:
+            counts[c].update(X[c].dropna().tolist())
+        label_counts.update(y.tolist())
+
+    if columns is None:
+        raise ValueError(f"No rows in {path}")
+    if set(label_counts) != {0, 1}:
+        raise ValueError(f"Both classes are needed to train, got label counts {dict(label_counts)}")
+
+    medians = np.array([reservoirs[c].median() for c in numeric_cols])
+    means, scales = [], []
+    for c, median in zip(numeric_cols, medians):
+        # The scaler sees the imputed column: missing values count as the median
+        moments[c].merge(missing[c], float(median), 0.0)
+        std = np.sqrt(moments[c].m2 / moments[c].n)
+        means.append(moments[c].mean)
+        scales.append(std if std > 0 else 1.0)
+
+    # Ties go to the smallest value, as in SimpleImputer(strategy="most_frequent")
+    fill_values = [min(counts[c], key=lambda v: (-counts[c][v], v)) for c in categorical_cols]
+    categories = [sorted(counts[c]) for c in categorical_cols]
+
+    preprocessor = RowPreprocessor(
+        numeric_cols, medians, np.array(means), np.array(scales), list(categorical_cols), fill_values, categories
+    )
+    return StreamStats(columns, numeric_cols, list(categorical_cols), preprocessor, dict(label_counts))
+
+
+def encode_chunk(preprocessor: RowPreprocessor, X: pd.DataFrame) -> np.ndarray:
+    """Vectorized `RowPreprocessor.transform` for a DataFrame chunk with engineered features."""
+    n_numeric = len(preprocessor.numeric_cols)
+    rows = np.zeros((len(X), preprocessor.n_features))
+
+    numbers = X[preprocessor.numeric_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    numbers = np.where(np.isnan(numbers), preprocessor.medians, numbers)
+    rows[:, :n_numeric] = (numbers - preprocessor.means) / preprocessor.scales
+
+    offset = n_numeric
+    for col, fill, cats in zip(preprocessor.categorical_cols, preprocessor.fill_values, preprocessor.categories):
+        # Unknown categories get code -1 and encode as all zeros
+        codes = pd.Categorical(X[col].fillna(fill), categories=cats).codes
+        known = np.flatnonzero(codes >= 0)
+        rows[known, offset + codes[known]] = 1.0
+        offset += len(cats)
+
+    return rows
+
+
+def train(
+    path: str | Path, cfg: Config, stream_cfg: StreamConfig
+) -> Tuple[CompiledScorer, Dict[str, float]]:
+    categorical_cols = infer_categorical(path, cfg, stream_cfg)
+    stats = collect_stats(path, categorical_cols, cfg, stream_cfg)
+    print(f"Statistics pass: {sum(stats.label_counts.values())} training rows, labels {stats.label_counts}")
+
+    # The features are already standardized; a decaying step size with averaged
+    # weights keeps SGD from overshooting into saturated probabilities
+    model = SGDClassifier(
+        loss="log_loss",
+        alpha=stream_cfg.alpha,
+        learning_rate="invscaling",
+        eta0=stream_cfg.eta0,
+        average=True,
+        class_weight=stats.class_weight(),
+        random_state=stream_cfg.random_state,
+    )
+    classes = np.array([0, 1])
+
+    def encoded_chunks() -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        for X, y, held in iter_split_chunks(path, categorical_cols, cfg, stream_cfg):
+            yield encode_chunk(stats.preprocessor, X), y.to_numpy(), held
+
+    for epoch in range(stream_cfg.epochs):
+        for rows, y, held in encoded_chunks():
+            if (~held).any():
+                model.partial_fit(rows[~held], y[~held], classes=classes)
+        print(f"Epoch {epoch + 1}/{stream_cfg.epochs} done")
+
+    # Evaluate the final model only, in its own pass
+    holdout_y, holdout_proba = [], []
+    if stream_cfg.holdout > 0:
+        for rows, y, held in encoded_chunks():
+            if held.any():
+                holdout_y.append(y[held])
+                holdout_proba.append(model.predict_proba(rows[held])[:, 1])
+
+    report: Dict[str, float] = {}
+    threshold = 0.5
+    if holdout_y:
+        y_true, proba = np.concatenate(holdout_y), np.concatenate(holdout_proba)
+        threshold, best_f1 = tune_threshold(y_true, proba, metric="f1")
+        report = {"holdout_rows": float(len(y_true)), "best_f1": best_f1, "threshold": threshold}
+        if len(np.unique(y_true)) == 2:
+            report["roc_auc"] = float(roc_auc_score(y_true, proba))
+
+    compiled = CompiledScorer(
+        stats.columns, stats.preprocessor, model.coef_[0].astype(float), float(model.intercept_[0]), threshold
+    )
+    return compiled, report
+
+
+def score(model_path: str | Path, path: str | Path, out_path: str | Path, cfg: Config, stream_cfg: StreamConfig) -> int:
+    """Score a CSV/Parquet file chunk by chunk with a compiled model; write id, probability, decision."""
+    scorer = CompiledScorer.load(model_path)
+    pre = scorer.preprocessor
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    with open(out_path, "w", newline="") as f:
+        for chunk in iter_chunks(path, stream_cfg.chunk_size, pre.categorical_cols):
+            X = add_features(chunk.reindex(columns=scorer.columns))
+            z = encode_chunk(pre, X) @ scorer.coef + scorer.intercept
+            proba = 1.0 / (1.0 + np.exp(-z))
+
+            if cfg.id_col in chunk.columns:
+                ids = chunk[cfg.id_col].to_numpy()
+            else:
+                ids = np.arange(written, written + len(chunk))
+            out = pd.DataFrame(
+                {cfg.id_col: ids, "probability": proba, "decision": np.where(proba >= scorer.threshold, "Y", "N")}
+            )
+            out.to_csv(f, header=written == 0, index=False)
+            written += len(out)
+
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = sub.add_parser("train", help="Train an SGD logistic regression out of core.")
+    train_parser.add_argument("--data", type=str, default="loan.csv", help="Path to dataset CSV or Parquet.")
+    train_parser.add_argument("--out", type=str, default="models/loan_sgd.npz", help="Output path of the compiled model.")
+    train_parser.add_argument("--epochs", type=int, default=StreamConfig.epochs, help="Learning passes over the file.")
+    train_parser.add_argument("--holdout", type=float, default=StreamConfig.holdout, help="Share of rows held out.")
+
+    score_parser = sub.add_parser("score", help="Score a file chunk by chunk with a compiled model.")
+    score_parser.add_argument("--model", type=str, default="models/loan_sgd.npz", help="Compiled model (.npz).")
+    score_parser.add_argument("--data", type=str, required=True, help="Path to CSV or Parquet to score.")
+    score_parser.add_argument("--out", type=str, required=True, help="Output CSV (id, probability, decision).")
+
+    for p in (train_parser, score_parser):
+        p.add_argument("--chunk_size", type=int, default=StreamConfig.chunk_size, help="Rows per chunk.")
+    args = parser.parse_args()
+
+    cfg = Config()
+
+    if args.command == "train":
+        stream_cfg = StreamConfig(chunk_size=args.chunk_size, epochs=args.epochs, holdout=args.holdout)
+        compiled, report = train(args.data, cfg, stream_cfg)
+        print("\n=== Holdout Evaluation ===")
+        print("Metrics:", report)
+
+        out_path = Path(args.out)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        compiled.save(out_path)
+        print(f"\nSaved compiled model to: {out_path.resolve()}")
+    else:
+        stream_cfg = StreamConfig(chunk_size=args.chunk_size)
+        written = score(args.model, args.data, args.out, cfg, stream_cfg)
+        print(f"Scored {written} rows to: {Path(args.out).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
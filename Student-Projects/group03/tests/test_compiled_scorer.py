@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from advanced_loan_pipeline import (  # noqa: E402
+    Config,
+    add_features,
+    build_preprocessor,
+    export_compiled,
+    make_pipeline,
+    split_xy,
+)
+from compiled_scorer import CompiledScorer  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def split():
+    cfg = Config()
+    df = pd.read_csv(ROOT / "loan.csv")
+    # Text columns as object dtype, as build_preprocessor expects
+    df = df.astype({c: object for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])})
+    X, y = split_xy(add_features(df), cfg)
+    X_train, X_test, y_train, _ = train_test_split(
+        X, y, test_size=cfg.test_size, random_state=cfg.random_state, stratify=y
+    )
+
+    preprocessor, _, _ = build_preprocessor(X_train)
+    model = make_pipeline(preprocessor, LogisticRegression(max_iter=20000, class_weight="balanced"))
+    model.fit(X_train, y_train)
+    return model, X_test.reset_index(drop=True)
+
+
+def _held_out(X_test: pd.DataFrame) -> pd.DataFrame:
+    # Nulls in every column and categories the model has never seen
+    X = X_test.copy()
+    rng = np.random.default_rng(0)
+    for col in X.columns:
+        X.loc[rng.random(len(X)) < 0.15, col] = np.nan
+    X.loc[::7, "Property_Area"] = "Offshore"
+    X.loc[3::11, "Gender"] = "Unknown"
+    X.loc[5::13, "Education"] = "Doctorate"
+    X.loc[len(X)] = np.nan
+    # Engineered features follow the nulls, as at scoring time
+    return add_features(X.drop(columns=["TotalIncome", "LoanAmount_to_Income"]))
+
+
+def _records(X: pd.DataFrame):
+    # JSON-like records: missing values are None
+    return [{k: (None if pd.isna(v) else v) for k, v in row.items()} for row in X.to_dict("records")]
+
+
+def test_saved_scorer_matches_pipeline(split, tmp_path):
+    model, X_test = split
+    X = _held_out(X_test)
+    raw = X.drop(columns=["TotalIncome", "LoanAmount_to_Income"])
+    assert raw.isna().any().all()
+
+    compiled = CompiledScorer.from_pipeline(model, columns=list(X.columns), threshold=0.45)
+    path = tmp_path / "loan_model.npz"
+    compiled.save(path)
+    loaded = CompiledScorer.load(path)
+
+    expected = model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(loaded.predict_proba(_records(X)), expected, rtol=0, atol=1e-9)
+    assert loaded.threshold == 0.45
+    assert loaded.columns == list(X.columns)
+
+
+def test_single_records_match_batch(split, tmp_path):
+    model, X_test = split
+    X = _held_out(X_test)
+    path = tmp_path / "loan_model.joblib"
+    export_compiled(model, path, X_test, threshold=0.5)
+    loaded = CompiledScorer.load(path.with_suffix(".npz"))
+
+    batch = loaded.predict_proba(_records(X))
+    single = [loaded.score_one(r)["probability"] for r in _records(X)]
+    np.testing.assert_allclose(single, batch, rtol=0, atol=1e-12)
+
+
+def test_other_models_are_rejected(split):
+    from sklearn.ensemble import RandomForestClassifier
+
+    model, X_test = split
+    forest = make_pipeline(model.named_steps["preprocess"], RandomForestClassifier(n_estimators=5))
+    with pytest.raises(ValueError):
+        CompiledScorer.from_pipeline(forest, columns=list(X_test.columns))
@@ -0,0 +1,92 @@
+import json
+import sys
+import threading
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from advanced_loan_pipeline import Config, add_features, build_preprocessor, make_pipeline, split_xy  # noqa: E402
+from scoring_service import LoanScorer, serve  # noqa: E402
+
+
+APPLICATION = {
+    "Gender": "Male",
+    "Married": "Yes",
+    "Dependents": "1",
+    "Education": "Graduate",
+    "Self_Employed": "No",
+    "ApplicantIncome": 4583,
+    "CoapplicantIncome": 1508,
+    "LoanAmount": 128,
+    "Loan_Amount_Term": 360,
+    "Credit_History": 1,
+    "Property_Area": "Rural",
+}
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    cfg = Config()
+    df = pd.read_csv(ROOT / "loan.csv")
+    # Text columns as object dtype, as build_preprocessor expects
+    df = df.astype({c: object for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])})
+    X, y = split_xy(add_features(df), cfg)
+    preprocessor, _, _ = build_preprocessor(X)
+    model = make_pipeline(preprocessor, LogisticRegression(max_iter=20000, class_weight="balanced"))
+    model.fit(X, y)
+    return LoanScorer(model, threshold=0.5, columns=list(X.columns))
+
+
+def _imputed(scorer, record):
+    # The same record with every null replaced by the training imputation value
+    fills = dict(zip(scorer.fast.numeric_cols, scorer.fast.medians.tolist()))
+    fills.update(zip(scorer.fast.categorical_cols, scorer.fast.fill_values))
+    return {k: fills[k] if v is None else v for k, v in record.items()}
+
+
+def test_fast_path_enabled_for_fresh_model(scorer):
+    assert scorer.fast is not None
+    assert scorer.compiled is not None
+
+
+def test_null_fields_are_imputed(scorer):
+    # LoanAmount stays set: it also feeds the engineered LoanAmount_to_Income
+    record = dict(APPLICATION, Gender=None, Married=None, Self_Employed=None, Credit_History=None)
+    expected = scorer.score_batch([_imputed(scorer, record)])[0]["probability"]
+
+    batch = scorer.score_batch([record, APPLICATION])
+    assert batch[0]["probability"] == pytest.approx(expected)
+    assert scorer.score_one(record)["probability"] == pytest.approx(expected)
+
+
+def test_all_null_batch_matches_single(scorer):
+    record = {k: None for k in APPLICATION}
+    batch = scorer.score_batch([record])[0]["probability"]
+    assert scorer.score_one(record)["probability"] == pytest.approx(batch)
+    assert scorer.score_one({})["probability"] == pytest.approx(batch)
+
+
+def test_http_nulls(scorer):
+    server = serve(scorer, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/score"
+        record = dict(APPLICATION, Gender=None, Credit_History=None)
+        payload = json.dumps({"applications": [record, record]}).encode()
+        with urllib.request.urlopen(urllib.request.Request(url, data=payload)) as response:
+            results = json.loads(response.read())["results"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    expected = scorer.score_one(_imputed(scorer, record))["probability"]
+    assert [r["probability"] for r in results] == pytest.approx([expected, expected])
+    assert np.isfinite(expected)
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from advanced_loan_pipeline import Config  # noqa: E402
+from streaming_pipeline import (  # noqa: E402
+    StreamConfig,
+    collect_stats,
+    infer_categorical,
+    iter_split_chunks,
+)
+
+
+def test_statistics_skip_the_holdout_rows():
+    cfg = Config()
+    stream_cfg = StreamConfig(chunk_size=100, schema_rows=100, holdout=0.3)
+    path = ROOT / "loan.csv"
+    categorical_cols = infer_categorical(path, cfg, stream_cfg)
+
+    chunks = list(iter_split_chunks(path, categorical_cols, cfg, stream_cfg))
+    # Every pass holds out the same rows
+    again = iter_split_chunks(path, categorical_cols, cfg, stream_cfg)
+    assert all((held == other).all() for (_, _, held), (_, _, other) in zip(chunks, again))
+
+    X = pd.concat([X[~held] for X, _, held in chunks])
+    y = pd.concat([y[~held] for _, y, held in chunks])
+    assert 0 < len(X) < sum(len(held) for _, _, held in chunks)
+
+    stats = collect_stats(path, categorical_cols, cfg, stream_cfg)
+    assert stats.label_counts == y.value_counts().to_dict()
+
+    pre = stats.preprocessor
+    numbers = X[pre.numeric_cols].apply(pd.to_numeric, errors="coerce")
+    np.testing.assert_allclose(pre.medians, numbers.median().to_numpy())
+    imputed = numbers.fillna(numbers.median())
+    np.testing.assert_allclose(pre.means, imputed.mean().to_numpy())
+    np.testing.assert_allclose(pre.scales, imputed.std(ddof=0).to_numpy())
+    for col, cats in zip(pre.categorical_cols, pre.categories):
+        assert cats == sorted(X[col].dropna().unique())
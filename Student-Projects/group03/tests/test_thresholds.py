@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.metrics import f1_score, precision_score, recall_score
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from advanced_loan_pipeline import threshold_curve, tune_threshold  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def scores():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, 300)
+    # Rounded so that many probabilities are tied
+    proba = np.round(np.clip(0.3 * y + rng.random(300) * 0.7, 0, 1), 2)
+    return y, proba
+
+
+def test_curve_matches_sklearn_at_every_threshold(scores):
+    y, proba = scores
+    curve = threshold_curve(y, proba)
+
+    assert list(curve["threshold"]) == sorted(set(proba))
+    for row in curve.itertuples():
+        pred = (proba >= row.threshold).astype(int)
+        assert row.precision == pytest.approx(precision_score(y, pred, zero_division=0))
+        assert row.recall == pytest.approx(recall_score(y, pred, zero_division=0))
+        assert row.f1 == pytest.approx(f1_score(y, pred, zero_division=0))
+
+
+@pytest.mark.parametrize("metric", ["f1", "precision", "recall"])
+def test_tune_threshold_returns_the_best_point(scores, metric):
+    y, proba = scores
+    threshold, score = tune_threshold(y, proba, metric=metric)
+
+    curve = threshold_curve(y, proba)
+    assert score == pytest.approx(curve[metric].max())
+    # Ties go to the lowest threshold
+    assert threshold == curve.loc[curve[metric] == curve[metric].max(), "threshold"].min()
+
+
+def test_empty_and_mismatched_inputs_are_rejected():
+    with pytest.raises(ValueError, match="without samples"):
+        threshold_curve(np.array([]), np.array([]))
+    with pytest.raises(ValueError, match="without samples"):
+        tune_threshold([], [])
+    with pytest.raises(ValueError, match="same length"):
+        threshold_curve(np.array([0, 1]), np.array([0.5]))
+    with pytest.raises(ValueError):
+        tune_threshold([0, 1], [0.2, 0.8], metric="accuracy")
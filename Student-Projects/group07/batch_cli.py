@@ -0,0 +1,262 @@
+
+# batch_cli.py
+# Offline batch summarization of large corpus files.
+# Documents are streamed from a JSONL or TXT file (never loaded as a whole),
+# summarized by several workers (short texts of concurrent workers share
+# generate() batches through the GenerationBatcher; --processes uses forked
+# worker processes instead) and written as streaming JSONL in input order.
+# The output file is the checkpoint: an interrupted run started again with
+# --resume skips every document already written.
+#
+# Run:
+#     python batch_cli.py articles.jsonl summaries.jsonl --mode auto --workers 8
+#     python batch_cli.py articles.txt summaries.jsonl --resume
+#
+# Output, one line per document:
+#     {"id": ..., "mode": ..., "route": "direct" | "chunked" | "cache",
+#      "input_tokens": ..., "summary": ..., "seconds": ...}
+#     or {"id": ..., "mode": ..., "error": "..."} when a document failed
+#     (a JSONL line that is not a JSON object gets its line number as id)
+
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import summarize_text
+from batcher import GenerationBatcher
+from summary_cache import SummaryCache
+from worker_fleet import WorkerFleet
+from model import MODEL_NAME, BACKEND, warm_up
+
+
+def read_documents(path, text_field="text", id_field="id"):
+    """
+    Stream `(id, text)` pairs from a corpus file.
+
+    `.jsonl` files hold one JSON object per line (`text_field`, optional
+    `id_field`); any other file is read as plain text with one document per
+    line. Documents without an id get their line number. A JSONL line that
+    cannot be used yields the exception instead of a text, so the rest of
+    the corpus is still summarized and reported in order: under the
+    record's id when its text is missing or not a string, under the line
+    number when the line is not a JSON object.
+    """
+
+    jsonl = path.endswith(".jsonl")
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if jsonl:
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    yield line_number, exc
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, ValueError(f"expected a JSON object, got {type(record).__name__}")
+                    continue
+
+                doc_id = record.get(id_field, line_number)
+                text = record.get(text_field)
+                if not isinstance(text, str):
+                    text = ValueError(f"{text_field!r} is missing or not a string")
+                yield doc_id, text
+            else:
+                yield line_number, line
+
+
+def resume_point(output_path):
+    """
+    Number of complete records in an existing output file and the id of
+    the last one. A partially written last line (interrupted run) is removed.
+    """
+
+    if not os.path.exists(output_path):
+        return 0, None
+
+    count, last_id, valid_bytes = 0, None, 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                last_id = json.loads(line)["id"]
+            except (ValueError, KeyError):
+                break
+            count += 1
+            valid_bytes += len(line)
+
+    if valid_bytes < os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_bytes)
+
+    return count, last_id
+
+
+def skip_documents(documents, count, last_id):
+    """Skip the `count` documents already summarized; check that the ids match."""
+    for i in range(count):
+        doc_id, _ = next(documents, (None, None))
+        if i == count - 1 and doc_id != last_id:
+            raise SystemExit(
+                f"Output does not match the input: document {count} has id {doc_id!r}, "
+                f"the output ends with {last_id!r}"
+            )
+    return documents
+
+
+class Summarizer:
+    """Summarizes one document in a worker thread and returns its output record."""
+
+    def __init__(self, mode, cache, batcher=None, fleet=None):
+        self.mode = mode
+        self.cache = cache
+        self.batcher = batcher
+        self.fleet = fleet
+
+    def __call__(self, doc_id, text):
+        start = time.perf_counter()
+        try:
+            if isinstance(text, Exception):
+                # Unreadable input line (see read_documents)
+                raise text
+            if self.fleet is not None:
+                summary, info = self.fleet.summarize(text, self.mode)
+            else:
+                info = {}
+                summary = summarize_text(
+                    text, self.mode, cache=self.cache, batcher=self.batcher,
+                    on_route=lambda route, num_tokens: info.update(
+                        route=route, input_tokens=num_tokens
+                    ),
+                )
+        except Exception as exc:
+            return {"id": doc_id, "mode": self.mode, "error": f"{type(exc).__name__}: {exc}"}
+
+        return {
+            "id": doc_id,
+            "mode": self.mode,
+            "route": info.get("route"),
+            "input_tokens": info.get("input_tokens"),
+            "summary": summary,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+def run(documents, summarize, output, workers, window, sync_every, report_every, done=0):
+    """
+    Summarize `documents` with `workers` threads and append the records to
+    the open file `output` in input order. At most `window` documents are
+    in flight, so memory stays bounded for any corpus size.
+    """
+
+    started = time.monotonic()
+    written = errors = 0
+
+    def write(record):
+        nonlocal written, errors
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        written += 1
+        errors += "error" in record
+        if written % sync_every == 0:
+            os.fsync(output.fileno())
+        if written % report_every == 0:
+            rate = written / (time.monotonic() - started)
+            print(
+                f"{done + written} documents ({rate:.2f}/s, {errors} errors)",
+                file=sys.stderr, flush=True,
+            )
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        pending = deque()
+        for doc_id, text in documents:
+            pending.append(executor.submit(summarize, doc_id, text))
+            # Write finished documents in order; wait when the window is full
+            while pending and (len(pending) >= window or pending[0].done()):
+                write(pending.popleft().result())
+
+        while pending:
+            write(pending.popleft().result())
+
+    os.fsync(output.fileno())
+    return written, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a JSONL/TXT corpus to JSONL.")
+    parser.add_argument("input", help=".jsonl (one object per line) or text file (one document per line).")
+    parser.add_argument("output", help="Output JSONL file.")
+    parser.add_argument("--mode", default="auto", choices=["short", "medium", "long", "auto"])
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the text.")
+    parser.add_argument("--id-field", default="id", help="JSONL field holding the document id.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent documents.")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Use this many forked worker processes (see worker_fleet.py).")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Maximum short texts decoded in one generate() call.")
+    parser.add_argument("--cache-path", help="SQLite file for the summary cache.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping documents already in the output.")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing output file.")
+    parser.add_argument("--sync-every", type=int, default=100, help="fsync the output every N documents.")
+    parser.add_argument("--report-every", type=int, default=100, help="Progress line every N documents.")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output) and not (args.resume or args.overwrite):
+        parser.error(f"{args.output} exists; use --resume to continue or --overwrite to replace it")
+
+    done, last_id = 0, None
+    if args.resume:
+        done, last_id = resume_point(args.output)
+    elif args.overwrite and os.path.exists(args.output):
+        os.remove(args.output)
+
+    documents = read_documents(args.input, args.text_field, args.id_field)
+    if done:
+        documents = skip_documents(documents, done, last_id)
+        print(f"resuming after {done} documents", file=sys.stderr)
+
+    fleet = batcher = None
+    if args.processes:
+        # Fork before any thread is started
+        fleet = WorkerFleet(num_workers=args.processes, cache_path=args.cache_path)
+        fleet.start()
+        workers = max(args.workers, args.processes)
+        cache = None
+    else:
+        warm_up(background=False)
+        batcher = GenerationBatcher(max_batch_size=args.batch_size, max_wait_ms=10)
+        workers = args.workers
+        cache = SummaryCache(f"{MODEL_NAME}/{BACKEND}", path=args.cache_path)
+
+    summarize = Summarizer(args.mode, cache, batcher=batcher, fleet=fleet)
+
+    try:
+        with open(args.output, "a", encoding="utf-8") as output:
+            written, errors = run(
+                documents, summarize, output,
+                workers=workers,
+                window=workers * 4,
+                sync_every=args.sync_every,
+                report_every=args.report_every,
+                done=done,
+            )
+    finally:
+        if batcher is not None:
+            batcher.close()
+        if fleet is not None:
+            fleet.shutdown()
+
+    print(f"done: {done + written} documents ({written} new, {errors} errors)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+
+# batcher.py
+# Dynamic request batching in front of the shared model.
+# Every direct summarization used to run its own generate() call with batch
+# size 1. The GenerationBatcher collects requests arriving from several threads
+# within a few milliseconds, groups them by generation settings (same length
+# bounds and beam settings, i.e. the same mode) and runs each group as one
+# padded batch, then hands every caller its own summary.
+
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from model import get_tokenizer, get_model
+from document import build_model_inputs
+from profiling import stage
+
+
+class _Request:
+    __slots__ = ("token_ids", "settings", "future")
+
+    def __init__(self, token_ids, settings):
+        self.token_ids = token_ids
+        self.settings = settings
+        self.future = Future()
+
+
+class GenerationBatcher:
+    """
+    Micro-batching scheduler for `model.generate`.
+
+    Parameters
+    ----------
+    max_batch_size : int, optional (default=8)
+        Maximum number of requests decoded together.
+    max_wait_ms : float, optional (default=10)
+        How long the first request of a batch waits for others to join.
+    """
+
+    def __init__(self, max_batch_size=8, max_wait_ms=10):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, token_ids, **generate_kwargs):
+        """
+        Queue one input for generation.
+
+        Parameters
+        ----------
+        token_ids : list of int
+            Input token ids without special tokens (e.g. PreparedDocument.token_ids).
+        **generate_kwargs
+            Settings passed to `model.generate` (min_length, max_length,
+            num_beams, ...). Only requests with identical settings are batched.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the decoded summary.
+        """
+
+        self._ensure_thread()
+        settings = tuple(sorted(generate_kwargs.items()))
+        request = _Request(token_ids, settings)
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, token_ids, **generate_kwargs):
+        """Blocking version of `submit`."""
+        return self.submit(token_ids, **generate_kwargs).result()
+
+    def close(self):
+        """Stop the scheduler thread after the queued requests are served."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    # ---------------- internals ----------------
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._loop, name="generation-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def _collect(self, first):
+        # Wait up to max_wait for more requests to join the first one
+        pending = [first]
+        deadline = time.monotonic() + self.max_wait
+        stop = False
+
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                stop = True
+                break
+            pending.append(request)
+
+        return pending, stop
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            pending, stop = self._collect(first)
+
+            # Requests with the same settings (same mode) share one batch
+            groups = {}
+            for request in pending:
+                groups.setdefault(request.settings, []).append(request)
+
+            for settings, requests in groups.items():
+                self._run(requests, dict(settings))
+
+            if stop:
+                return
+
+    def _run(self, requests, settings):
+        try:
+            tokenizer, model = get_tokenizer(), get_model()
+
+            # Similar lengths next to each other keep padding small
+            requests = sorted(requests, key=lambda r: len(r.token_ids))
+
+            inputs = build_model_inputs(
+                [r.token_ids for r in requests], tokenizer, max_length=512
+            )
+            with stage("direct_generate"):
+                summary_ids = model.generate(
+                    inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    **settings
+                )
+            with stage("decode"):
+                summaries = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+
+        except Exception as exc:
+            for request in requests:
+                request.future.set_exception(exc)
+            return
+
+        for request, summary in zip(requests, summaries):
+            request.future.set_result(summary)
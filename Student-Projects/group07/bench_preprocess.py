@@ -0,0 +1,73 @@
+
+# bench_preprocess.py
+# Micro-benchmark of normalize_persian_text against the previous
+# implementation (one str.replace pass per Arabic letter plus two regex passes).
+#
+# Run:
+#     python bench_preprocess.py --size-kb 300 --repeat 20
+
+
+import argparse
+import re
+import timeit
+
+from preprocess import normalize_persian_text
+
+
+# Previous implementation, kept here only as the benchmark baseline
+def normalize_persian_text_legacy(text, remove_half_space=True, remove_symbols=True):
+    if remove_half_space:
+        text = text.replace('\u200c', ' ')
+
+    replacements = {
+        'ي': 'ی',
+        'ك': 'ک',
+        'ة': 'ه',
+        'ؤ': 'و',
+        'إ': 'ا',
+        'أ': 'ا'
+    }
+    for src, tgt in replacements.items():
+        text = text.replace(src, tgt)
+
+    if remove_symbols:
+        text = re.sub(r'[\"\'\(\)\[\]\{\}\*_,;:«»]', '', text)
+
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    return text
+
+
+SAMPLE = (
+    "این یک متن «آزمایشی» است که در آن (برخی) كلمات با حروف عربي نوشته شده‌اند؛ "
+    "هدف: سنجش سرعت نرمال‌سازی، روی متن‌های بزرگ!\n"
+    "آيا إصلاح حروف و حذف [نمادها] درست انجام مي‌شود؟  "
+)
+
+
+def make_text(size_kb):
+    repeats = max(1, (size_kb * 1024) // len(SAMPLE.encode("utf-8")))
+    return SAMPLE * repeats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-kb", type=int, default=300, help="Approximate input size in KB.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per implementation.")
+    args = parser.parse_args()
+
+    text = make_text(args.size_kb)
+
+    # Both implementations agree on inputs without Arabic digits or 'ى'
+    assert normalize_persian_text(text) == normalize_persian_text_legacy(text)
+
+    legacy = timeit.timeit(lambda: normalize_persian_text_legacy(text), number=args.repeat)
+    current = timeit.timeit(lambda: normalize_persian_text(text), number=args.repeat)
+
+    print(f"input: {len(text.encode('utf-8')) / 1024:.0f} KB, {args.repeat} calls")
+    print(f"legacy : {legacy / args.repeat * 1000:8.2f} ms/call")
+    print(f"current: {current / args.repeat * 1000:8.2f} ms/call  ({legacy / current:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
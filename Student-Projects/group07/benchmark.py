@@ -0,0 +1,332 @@
+
+# benchmark.py
+# Benchmark harness for the summarization paths.
+# Runs summarize_direct and summarize_chunked on synthetic Persian texts of
+# several lengths and reports latency, generated tokens/sec, per-stage timings
+# (normalize, tokenize, stage1/reduce/stage2/direct generate, decode) and memory.
+# Results can be written as JSON and compared against a previous run, so a
+# performance change can be validated before it is deployed.
+#
+# Run (offline, tiny randomly initialized model):
+#     python benchmark.py --tiny --lengths 200 1500 --json current.json
+#     python benchmark.py --tiny --compare baseline.json
+# Run against the real model (MODEL_NAME / SUMMARIZER_BACKEND):
+#     python benchmark.py --modes short auto --repeat 5
+
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import profiling
+from model import MODEL_NAME, BACKEND, get_tokenizer, get_model, set_model
+from preprocess import normalize_persian_text
+from document import prepare_document
+from direct_summarizer import summarize_direct
+from chunk_summarizer import summarize_chunked
+
+
+# Words used to build the synthetic corpora (mixed with Arabic letters,
+# half-spaces and symbols so normalization has real work to do)
+WORDS = (
+    "این آن ما شما ایران تهران کتاب دانشگاه دانشجو پژوهش مدل زبان فارسی متن "
+    "خلاصه سازی شبکه عصبی داده آموزش نتیجه بررسی روش جدید مهم بزرگ کوچک "
+    "سال روز شهر کشور دولت مردم اقتصاد فرهنگ تاریخ علم فناوری رایانه "
+    "است بود شد کرد می‌شود می‌کند نمی‌شود خواهد داشت گفت نوشت "
+    "كتاب علمي «گزارش» (پژوهشی) [جدول] ١٤٠٢ ۱۴۰۲ و در به از با برای که را"
+).split()
+
+SENTENCE_ENDS = (".", ".", ".", "؟", "!")
+
+DEFAULT_LENGTHS = (150, 400, 1500, 4000)
+
+
+def make_corpus(num_words, seed=0):
+    """Deterministic synthetic Persian text of about `num_words` words."""
+    rng = random.Random(seed + num_words)
+    sentences = []
+    count = 0
+    while count < num_words:
+        size = rng.randint(6, 18)
+        words = [rng.choice(WORDS) for _ in range(size)]
+        sentences.append(" ".join(words) + rng.choice(SENTENCE_ENDS))
+        count += size
+    return " ".join(sentences)
+
+
+# ---------------- tiny offline model ----------------
+
+def build_tiny_model(hidden_size=64, layers=2, max_positions=512, seed=0):
+    """
+    Randomly initialized bert2bert model and a tokenizer built from WORDS,
+    with the same architecture family as MODEL_NAME. Needs no download.
+    """
+    import torch
+    from transformers import (
+        BertConfig, BertModel, BertLMHeadModel, BertTokenizerFast, EncoderDecoderModel
+    )
+
+    torch.manual_seed(seed)
+
+    # Vocabulary: special tokens, all characters and whole words of the corpus
+    text = normalize_persian_text(" ".join(WORDS) + " " + "".join(SENTENCE_ENDS))
+    chars = sorted(set(text.replace(" ", "")))
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    vocab += chars + ["##" + c for c in chars] + sorted(set(text.split()))
+    vocab = list(dict.fromkeys(vocab))
+
+    vocab_dir = tempfile.mkdtemp(prefix="bench_vocab_")
+    vocab_file = os.path.join(vocab_dir, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+    tokenizer = BertTokenizerFast(vocab_file, do_lower_case=False)
+
+    def config(**kwargs):
+        return BertConfig(
+            vocab_size=len(vocab),
+            hidden_size=hidden_size,
+            num_hidden_layers=layers,
+            num_attention_heads=2,
+            intermediate_size=hidden_size * 2,
+            max_position_embeddings=max_positions,
+            **kwargs
+        )
+
+    model = EncoderDecoderModel(
+        encoder=BertModel(config()),
+        decoder=BertLMHeadModel(config(is_decoder=True, add_cross_attention=True)),
+    )
+    model.config.decoder_start_token_id = tokenizer.cls_token_id
+    model.config.pad_token_id = tokenizer.pad_token_id
+    model.config.eos_token_id = tokenizer.sep_token_id
+    model.generation_config.decoder_start_token_id = tokenizer.cls_token_id
+    model.generation_config.pad_token_id = tokenizer.pad_token_id
+    model.generation_config.eos_token_id = tokenizer.sep_token_id
+    model.eval()
+
+    return tokenizer, model
+
+
+# ---------------- memory ----------------
+
+def current_rss_mb():
+    """Resident set size right now (Linux /proc, falls back to peak)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+# ---------------- measurement ----------------
+
+def run_case(path, text, mode, repeat, warmup=1):
+    """
+    Time one (path, mode, input) case.
+
+    Parameters
+    ----------
+    path : str
+        "direct" or "chunked".
+    text : str
+        Raw input text (normalization and tokenization are timed too).
+    mode : str
+        Summary mode ("short", "medium", "long", "auto").
+    repeat : int
+        Timed runs; `warmup` untimed runs are done first.
+
+    Returns
+    -------
+    dict
+        Latency statistics, tokens/sec, mean per-stage seconds and RSS.
+    """
+
+    tokenizer = get_tokenizer()
+    length_reports = []
+
+    def run_once():
+        # Same steps as pipeline.summarize_text, without its cache and routing
+        with profiling.stage("normalize"):
+            normalized = normalize_persian_text(text)
+        doc = prepare_document(normalized, tokenizer, normalize=False)
+        if path == "direct":
+            return doc, summarize_direct(doc, mode, on_length=length_reports.append)
+        return doc, summarize_chunked(doc, mode)
+
+    for _ in range(warmup):
+        run_once()
+
+    stages = defaultdict(float)
+
+    def listener(name, seconds):
+        stages[name] += seconds
+
+    latencies = []
+    generated_tokens = 0
+    profiling.add_listener(listener)
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            doc, summary = run_once()
+            latencies.append(time.perf_counter() - start)
+            generated_tokens += len(tokenizer.encode(summary, add_special_tokens=False))
+    finally:
+        profiling.remove_listener(listener)
+
+    total = sum(latencies)
+    result = {
+        "path": path,
+        "mode": mode,
+        "input_tokens": doc.num_tokens,
+        "repeat": repeat,
+        "latency_mean": total / repeat,
+        "latency_median": statistics.median(latencies),
+        "latency_min": min(latencies),
+        "tokens_per_sec": generated_tokens / total if total else 0.0,
+        "stages": {name: seconds / repeat for name, seconds in sorted(stages.items())},
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    # Auto mode of the direct path: generated length versus token budget
+    if length_reports:
+        last = length_reports[-1]
+        result["auto_length"] = {
+            "budget": last.budget, "max_length": last.max_length, "generated": last.generated
+        }
+
+    return result
+
+
+def case_key(result):
+    return f"{result['path']}/{result['mode']}/{result['words']}"
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print the mean latency change of every case found in `baseline`.
+    Returns the keys of cases slower than `max_regression` (e.g. 0.10 = 10%).
+    """
+
+    old = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+
+    print(f"\n{'case':32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in results:
+        key = case_key(result)
+        if key not in old:
+            continue
+        before, after = old[key]["latency_mean"], result["latency_mean"]
+        change = (after - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > max_regression else ""
+        print(f"{key:32} {before * 1000:9.1f}ms {after * 1000:9.1f}ms {change:+7.1%}{flag}")
+        if flag:
+            regressions.append(key)
+
+    return regressions
+
+
+def print_table(results):
+    stage_names = sorted({name for r in results for name in r["stages"]})
+    header = f"{'case':32} {'tokens':>6} {'mean':>9} {'tok/s':>7}"
+    header += "".join(f" {name:>16}" for name in stage_names)
+    header += f" {'rss MB':>7}"
+    print(header)
+    for r in results:
+        line = (
+            f"{case_key(r):32} {r['input_tokens']:6d} "
+            f"{r['latency_mean'] * 1000:7.1f}ms {r['tokens_per_sec']:7.1f}"
+        )
+        line += "".join(f" {r['stages'].get(name, 0.0) * 1000:14.1f}ms" for name in stage_names)
+        line += f" {r['rss_mb']:7.0f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the summarization paths.")
+    parser.add_argument("--tiny", action="store_true",
+                        help="Use a tiny randomly initialized model (offline).")
+    parser.add_argument("--paths", nargs="+", default=["direct", "chunked"],
+                        choices=["direct", "chunked"])
+    parser.add_argument("--modes", nargs="+", default=["short", "auto"],
+                        choices=["short", "medium", "long", "auto"])
+    parser.add_argument("--lengths", nargs="+", type=int, default=list(DEFAULT_LENGTHS),
+                        help="Input lengths in words.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file from a previous run.")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed slowdown against --compare before failing (0.10 = 10%%).")
+    args = parser.parse_args()
+
+    if args.tiny:
+        tokenizer, model = build_tiny_model()
+        set_model(tokenizer=tokenizer, model=model)
+        model_name = "tiny-random-bert2bert"
+    else:
+        model_name = MODEL_NAME
+
+    load_start = time.perf_counter()
+    get_tokenizer(), get_model()
+    load_seconds = time.perf_counter() - load_start
+
+    results = []
+    for words in args.lengths:
+        text = make_corpus(words)
+        for path in args.paths:
+            for mode in args.modes:
+                result = run_case(path, text, mode, args.repeat)
+                result["words"] = words
+                results.append(result)
+
+    report = {
+        "model": model_name,
+        "backend": BACKEND,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "load_seconds": load_seconds,
+        "results": results,
+    }
+
+    print(f"model: {model_name} ({BACKEND}), loaded in {load_seconds:.2f}s\n")
+    print_table(results)
+    for r in results:
+        if "auto_length" in r:
+            length = r["auto_length"]
+            print(
+                f"{case_key(r)}: generated {length['generated']} tokens, "
+                f"budget {length['budget']}, cap {length['max_length']}"
+            )
+
+    print(f"\npeak RSS: {peak_rss_mb():.0f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
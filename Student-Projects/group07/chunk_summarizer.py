@@ -4,34 +4,150 @@
 # Handles long-text summarization using  two-stage
 # chunk-based approach:
 #   1) Summarize each chunk
-#   2) Re-summarize merged chunk summaries
+#   2) Re-summarize merged chunk summaries; when they do not fit into the
+#      model input, reduce them level by level (map-reduce tree) first
 
 
-from model import tokenizer, model
-from preprocess import normalize_persian_text
+from model import get_tokenizer, get_model
+from document import ensure_document, build_model_inputs
+from profiling import stage
+from decoding import FULL_PLAN
+from preprocess import SENTENCE_END_CHARS
+from dataclasses import dataclass
 import math
 
 
-# Split text into overlapping token chunks
-def split_to_chunks(text, max_tokens=450, overlap=50):
-    # Tokenize full text
-    tokens = tokenizer.encode(text)
-    chunks = []
+# Maximum number of chunks decoded together in one generate() call.
+# Larger batches amortize beam search overhead but need more memory.
+CHUNK_BATCH_SIZE = 4
 
-    # Sliding window over tokens
-    start = 0
-    while start < len(tokens):
-        end = start + max_tokens
-        chunk_tokens = tokens[start:end]
+# Model input/output limit in tokens (special tokens included)
+MODEL_MAX_TOKENS = 512
 
-        # Decode tokens back to text for the model
-        chunk_text = tokenizer.decode(chunk_tokens, skip_special_tokens=True)
-        chunks.append(chunk_text)
+# Maximum number of summaries merged into one node of the reduce tree
+REDUCE_FAN_OUT = 8
 
-        # Move window with overlap
-        start += max_tokens - overlap
+# Token budget of one stage-1 chunk
+CHUNK_MAX_TOKENS = 450
 
-    return chunks
+
+# Sentence boundaries in token positions
+def sentence_boundaries(doc, tokenizer):
+    """
+    Token positions right after every sentence-ending token of `doc`.
+
+    The character offsets of the PreparedDocument are used when available;
+    for slow tokenizers the token strings are checked instead.
+    """
+
+    if doc.offsets is not None:
+        text = doc.text
+        return [
+            i + 1 for i, (start, end) in enumerate(doc.offsets)
+            if end > start and text[end - 1] in SENTENCE_END_CHARS
+        ]
+
+    tokens = tokenizer.convert_ids_to_tokens(doc.token_ids)
+    return [i + 1 for i, token in enumerate(tokens) if token and token[-1] in SENTENCE_END_CHARS]
+
+
+# Pack whole sentences into chunks
+def split_to_sentence_chunks(num_tokens, boundaries, max_tokens=CHUNK_MAX_TOKENS, overlap=0):
+    """
+    Greedily pack whole sentences into chunks of at most `max_tokens` tokens.
+
+    Parameters
+    ----------
+    num_tokens : int
+        Number of token ids of the document (without special tokens).
+    boundaries : list of int
+        Sorted token positions where a sentence ends (`sentence_boundaries`).
+    max_tokens : int, optional (default=CHUNK_MAX_TOKENS)
+        Token budget of one chunk.
+    overlap : int, optional (default=0)
+        Token budget of the context repeated at the start of the next chunk.
+        Only whole trailing sentences of the previous chunk are repeated;
+        0 disables overlap, which gives the fewest chunks.
+
+    Returns
+    -------
+    list of (int, int)
+        `(start, end)` spans into the document's token ids, in text order.
+        A sentence longer than `max_tokens` is cut into fixed-size windows.
+    """
+
+    # Sentence spans; text after the last punctuation is one more sentence
+    sentences, start = [], 0
+    for end in boundaries:
+        if end > start:
+            sentences.append((start, end))
+            start = end
+    if start < num_tokens:
+        sentences.append((start, num_tokens))
+
+    spans = []
+    current = []  # sentence spans of the chunk being packed
+    carried = 0   # how many of them were repeated from the previous chunk
+
+    def size(parts):
+        return parts[-1][1] - parts[0][0] if parts else 0
+
+    def flush():
+        if len(current) > carried:
+            spans.append((current[0][0], current[-1][1]))
+
+    for sentence in sentences:
+        if sentence[1] - sentence[0] > max_tokens:
+            # No punctuation for a long stretch: fall back to windows
+            flush()
+            current, carried = [], 0
+            for window_start in range(sentence[0], sentence[1], max_tokens):
+                window = (window_start, min(window_start + max_tokens, sentence[1]))
+                if window[1] - window[0] == max_tokens:
+                    spans.append(window)
+                else:
+                    current = [window]
+            continue
+
+        if current and size(current + [sentence]) > max_tokens:
+            flush()
+
+            # Repeat the trailing sentences that fit into the overlap budget
+            kept = []
+            for previous in reversed(current):
+                if size([previous] + kept) > overlap:
+                    break
+                kept.insert(0, previous)
+            if kept and size(kept + [sentence]) > max_tokens:
+                kept = []
+            current, carried = kept, len(kept)
+
+        current.append(sentence)
+
+    flush()
+
+    return spans
+
+
+def chunk_document(doc, tokenizer, max_tokens=CHUNK_MAX_TOKENS, overlap=0):
+    """
+    Sentence-aware chunks of a PreparedDocument.
+
+    Returns
+    -------
+    spans : list of (int, int)
+        Token spans of every chunk (see `split_to_sentence_chunks`).
+    chunks : list of list of int
+        The token id slices of these spans, ready for the model.
+    """
+
+    spans = split_to_sentence_chunks(
+        len(doc.token_ids),
+        sentence_boundaries(doc, tokenizer),
+        max_tokens=max_tokens,
+        overlap=overlap,
+    )
+    return spans, [doc.token_ids[start:end] for start, end in spans]
 
 
 # Output length controller for different modes
@@ -55,8 +171,10 @@ def get_chunk_lengths(mode, input_len=None):
         if input_len is None:
             raise ValueError("input_len is required for auto mode")
 
+        # Lengths are capped at the model limit: the decoder cannot
+        # produce more than MODEL_MAX_TOKENS tokens
         ratio = 0.25
-        final_max = max(100, int(math.ceil(input_len * ratio)))
+        final_max = min(MODEL_MAX_TOKENS, max(100, int(math.ceil(input_len * ratio))))
         final_min = max(60, int(final_max * 0.6))
 
         chunk_max = max(80, int(final_max / 2))
@@ -68,71 +186,324 @@ def get_chunk_lengths(mode, input_len=None):
         raise ValueError("Invalid mode")
 
 
-# Two-stage chunk-based summarization
+# Progress report emitted while a long text is being summarized
+@dataclass
+class ProgressEvent:
+    """
+    Attributes
+    ----------
+    kind : str
+        "chunk" when one stage-1 chunk summary is ready,
+        "reduce" when one node of a reduce tree level is summarized,
+        "final" when the final summary is ready.
+    done : int
+        Number of chunk (or reduce level node) summaries available so far.
+    total : int
+        Total number of chunks (or of nodes in the reduce level).
+    text : str
+        The chunk or node summary, or the final summary ("final").
+    index : int or None
+        Position of the chunk or node in its level (None for "final").
+    span : (int, int) or None
+        Token span of the chunk in the document's token ids ("chunk" only).
+    """
+
+    kind: str
+    done: int
+    total: int
+    text: str
+    index: int = None
+    span: tuple = None
 
-def summarize_chunked(text, mode):
+
+# Batched Stage 1: summarize many chunks with few generate() calls
+def iter_chunk_batches(chunks, min_length, max_length,
+                       batch_size=CHUNK_BATCH_SIZE, num_beams=4, stage_name="stage1"):
+    """
+    Summarize a list of token id chunks in padded batches, yielding
+    `(chunk_index, summary)` pairs as soon as each batch is decoded.
+    Generation time is reported to profiling as "<stage_name>_generate".
     """
-    Stage 1: Summarize each chunk separately
-    Stage 2: Summarize all chunk summaries into final output
 
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    tokenizer, model = get_tokenizer(), get_model()
+
+    # Bucket chunks by length so each batch needs as little padding as possible
+    order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]))
+
+    for start in range(0, len(order), batch_size):
+        batch_ids = order[start:start + batch_size]
+
+        inputs = build_model_inputs(
+            [chunks[i] for i in batch_ids],
+            tokenizer,
+            max_length=512
+        )
+
+        with stage(f"{stage_name}_generate"):
+            summary_ids = model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                min_length=min_length,
+                max_length=max_length,
+                num_beams=num_beams,
+                no_repeat_ngram_size=3,
+                early_stopping=num_beams > 1
+            )
+
+        with stage("decode"):
+            decoded = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+        yield from zip(batch_ids, decoded)
+
+
+def summarize_chunk_batch(chunks, min_length, max_length,
+                          batch_size=CHUNK_BATCH_SIZE, num_beams=4):
+    """
+    Summarize a list of token id chunks in padded batches.
+
+    Parameters
+    ----------
+    chunks : list of list of int
+        Token id slices produced by `chunk_document`.
+    min_length, max_length : int
+        Output length bounds applied to every chunk summary.
+    batch_size : int, optional (default=CHUNK_BATCH_SIZE)
+        Maximum number of chunks decoded together.
+    num_beams : int, optional (default=4)
+        Beam width used for every chunk.
+
+    Returns
+    -------
+    list of str
+        One summary per chunk, in the same order as `chunks`.
     """
 
-    # Normalize Persian text
-    text = normalize_persian_text(text)
+    # Put each decoded summary back at its chunk's original position
+    summaries = [None] * len(chunks)
+    for i, summary in iter_chunk_batches(
+        chunks, min_length, max_length, batch_size=batch_size, num_beams=num_beams
+    ):
+        summaries[i] = summary
 
-    # Split text into chunks
-    chunks = split_to_chunks(text)
+    return summaries
 
-    intermediate_summaries = []
 
-    # Total token count for auto mode
-    total_tokens = len(tokenizer.encode(text))
+# Stage 1 with a summary cache: only chunks without a cached summary are generated
+def iter_chunks_cached(chunks, min_length, max_length, cache,
+                       batch_size=CHUNK_BATCH_SIZE, num_beams=4, stage_name="stage1",
+                       store=True):
+    """
+    Same as `iter_chunk_batches`, but yields the summaries stored in
+    `cache` (a summary_cache.SummaryCache) first and stores the new ones
+    (unless `store` is False, e.g. for lower quality decoding).
+    """
+
+    missing = []
+    for i, chunk in enumerate(chunks):
+        summary = cache.get_chunk(chunk, min_length, max_length)
+        if summary is None:
+            missing.append(i)
+        else:
+            yield i, summary
+
+    generated = iter_chunk_batches(
+        [chunks[i] for i in missing],
+        min_length=min_length,
+        max_length=max_length,
+        batch_size=batch_size,
+        num_beams=num_beams,
+        stage_name=stage_name
+    )
+
+    for j, summary in generated:
+        i = missing[j]
+        if store:
+            cache.put_chunk(chunks[i], min_length, max_length, summary)
+        yield i, summary
+
+
+# Reduce tree: pack consecutive summaries into model-sized groups
+def group_summaries(pieces, max_tokens=MODEL_MAX_TOKENS - 2, fan_out=REDUCE_FAN_OUT):
+    """
+    Greedily pack consecutive summaries into groups that fit the model input.
+
+    Parameters
+    ----------
+    pieces : list of list of int
+        Token ids (without special tokens) of each summary, in text order.
+    max_tokens : int, optional
+        Token budget of one group.
+    fan_out : int, optional (default=REDUCE_FAN_OUT)
+        Maximum number of summaries per group (at least 2).
+
+    Returns
+    -------
+    list of list of int
+        Concatenated token ids of every group, each at most `max_tokens`
+        long; always fewer groups than pieces when there is more than one
+        piece.
+    """
+
+    if fan_out < 2:
+        raise ValueError("fan_out must be at least 2")
+
+    pieces = [list(ids[:max_tokens]) for ids in pieces]
+
+    groups, current, count = [], [], 0
+    for ids in pieces:
+        if count and (len(current) + len(ids) > max_tokens or count >= fan_out):
+            groups.append(current)
+            current, count = [], 0
+        current = current + list(ids)
+        count += 1
+    if count:
+        groups.append(current)
+
+    # No two neighbours fit together: merge pairs of halves so that the
+    # tree keeps shrinking (summaries of at most half the budget, as
+    # iter_summarize_chunked produces, are never cut here)
+    if len(pieces) > 1 and len(groups) == len(pieces):
+        half = max_tokens // 2
+        groups = [
+            pieces[i][:half] + (pieces[i + 1][:half] if i + 1 < len(pieces) else [])
+            for i in range(0, len(pieces), 2)
+        ]
+
+    return groups
+
+
+# Two-stage chunk-based summarization, reported step by step
+
+def iter_summarize_chunked(text, mode, batch_size=CHUNK_BATCH_SIZE, cache=None,
+                           fan_out=REDUCE_FAN_OUT, decoding=None, overlap=0):
+    """
+    Generator version of `summarize_chunked`.
+
+    Yields a ProgressEvent of kind "chunk" for every stage-1 chunk summary
+    (in completion order), events of kind "reduce" for every node of the
+    reduce tree, and finally one event of kind "final" carrying the final
+    summary, so callers can show partial results while the rest of the
+    text is still being summarized.
+    """
+
+    tokenizer, model = get_tokenizer(), get_model()
+    decoding = decoding or FULL_PLAN
+
+    # Normalize and tokenize once (no-op for a PreparedDocument)
+    doc = ensure_document(text, tokenizer)
+
+    # Split token ids into chunks of whole sentences
+    spans, chunks = chunk_document(doc, tokenizer, overlap=overlap)
 
     (chunk_min, chunk_max), (final_min, final_max) = get_chunk_lengths(
-        mode, input_len=total_tokens
+        mode, input_len=doc.num_tokens
     )
 
-    # -------- Stage 1: Chunk summaries --------
-    for chunk in chunks:
-        inputs = tokenizer(
-            chunk,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512
+    # Any two chunk or node summaries must fit one reduce input, so none
+    # of them is cut by group_summaries
+    budget = MODEL_MAX_TOKENS - tokenizer.num_special_tokens_to_add()
+    chunk_max = min(chunk_max, budget // 2)
+    chunk_min = min(chunk_min, chunk_max)
+
+    def summarize_level(pieces, stage_name):
+        # All pieces of one level are batched together
+        if cache is None:
+            return iter_chunk_batches(
+                pieces,
+                min_length=chunk_min,
+                max_length=chunk_max,
+                batch_size=batch_size,
+                num_beams=decoding.beams[stage_name],
+                stage_name=stage_name
+            )
+        # Cached summaries are reused by every request, so only
+        # full-quality ones are stored
+        return iter_chunks_cached(
+            pieces,
+            min_length=chunk_min,
+            max_length=chunk_max,
+            cache=cache,
+            batch_size=batch_size,
+            num_beams=decoding.beams[stage_name],
+            stage_name=stage_name,
+            store=decoding.is_full(stage_name)
         )
 
-        summary_ids = model.generate(
+    # -------- Stage 1: Chunk summaries --------
+    intermediate_summaries = [None] * len(chunks)
+    for done, (i, summary) in enumerate(summarize_level(chunks, "stage1"), start=1):
+        intermediate_summaries[i] = summary
+        yield ProgressEvent("chunk", done, len(chunks), summary, index=i, span=spans[i])
+
+    # -------- Reduce tree --------
+    # Merged summaries longer than the model input used to be truncated,
+    # silently dropping most of stage 1 for very long texts. Instead,
+    # groups of summaries are summarized again until everything fits.
+    summaries = intermediate_summaries
+
+    while True:
+        with stage("tokenize"):
+            pieces = tokenizer(
+                summaries, add_special_tokens=False, verbose=False
+            )["input_ids"] if summaries else []
+
+        # Joining summaries with spaces is the same as concatenating their ids
+        if sum(len(ids) for ids in pieces) <= budget or len(pieces) == 1:
+            break
+
+        groups = group_summaries(pieces, max_tokens=budget, fan_out=fan_out)
+        summaries = [None] * len(groups)
+        for done, (i, summary) in enumerate(summarize_level(groups, "reduce"), start=1):
+            summaries[i] = summary
+            yield ProgressEvent("reduce", done, len(groups), summary, index=i)
+
+    # -------- Stage 2: Final summary --------
+    merged_ids = [token for ids in pieces for token in ids]
+    inputs = build_model_inputs([merged_ids], tokenizer, max_length=MODEL_MAX_TOKENS)
+
+    with stage("stage2_generate"):
+        final_ids = model.generate(
             inputs["input_ids"],
             attention_mask=inputs["attention_mask"],
-            min_length=chunk_min,
-            max_length=chunk_max,
-            num_beams=4,
+            min_length=final_min,
+            max_length=final_max,
             no_repeat_ngram_size=3,
-            early_stopping=True
+            **decoding.generate_kwargs("final")
         )
 
-        intermediate_summaries.append(
-            tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        )
+    with stage("decode"):
+        final_summary = tokenizer.decode(final_ids[0], skip_special_tokens=True)
+    yield ProgressEvent("final", len(chunks), len(chunks), final_summary)
 
-    # -------- Stage 2: Final summary --------
-    merged_text = " ".join(intermediate_summaries)
 
-    inputs = tokenizer(
-        merged_text,
-        return_tensors="pt",
-        truncation=True,
-        max_length=512
-    )
+def summarize_chunked(text, mode, batch_size=CHUNK_BATCH_SIZE, cache=None,
+                      on_progress=None, fan_out=REDUCE_FAN_OUT, decoding=None,
+                      overlap=0):
+    """
+    Stage 1: Summarize chunks in padded batches of up to `batch_size`
+    Reduce:  While the chunk summaries do not fit into the model input,
+             summarize groups of at most `fan_out` of them
+    Stage 2: Summarize all remaining summaries into final output
+
+    `text` may be a raw string or a PreparedDocument from document.py;
+    in the latter case it is not normalized or tokenized again.
+    With a `cache` (summary_cache.SummaryCache), stage-1 summaries of
+    already seen chunks with the same length bounds are reused.
+    `on_progress`, if given, is called with every ProgressEvent.
+    `decoding` (a decoding.DecodingPlan) sets the beam width of every
+    stage; by default 4 beams per chunk and 5 for the final summary.
+    Chunks hold whole sentences; `overlap` is the token budget of the
+    sentences repeated from one chunk into the next (0 = no overlap).
+    """
 
-    final_ids = model.generate(
-        inputs["input_ids"],
-        attention_mask=inputs["attention_mask"],
-        min_length=final_min,
-        max_length=final_max,
-        num_beams=5,
-        no_repeat_ngram_size=3,
-        early_stopping=True
+    events = iter_summarize_chunked(
+        text, mode, batch_size=batch_size, cache=cache, fan_out=fan_out,
+        decoding=decoding, overlap=overlap
     )
+    for event in events:
+        if on_progress is not None:
+            on_progress(event)
 
-    return tokenizer.decode(final_ids[0], skip_special_tokens=True)
+    return event.text
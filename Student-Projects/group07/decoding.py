@@ -0,0 +1,161 @@
+
+# decoding.py
+# Decoding policy for the summarizers.
+# Every summary used to be generated with wide beam search (4 beams per chunk,
+# 5 for direct and final summaries) no matter how busy the bot was. A
+# DecodingPolicy picks a quality level per request from the inference queue
+# depth and an optional latency budget, and a DecodingPlan turns that level
+# into the beam width of every stage (direct, stage1, reduce, final).
+# Under load quality degrades step by step (full -> reduced -> greedy)
+# instead of latency growing without bound.
+
+
+import math
+from dataclasses import dataclass
+
+
+LEVELS = ("full", "reduced", "greedy")
+
+# Beam widths per level and stage; "full" is the summarizers' original setting
+BEAMS = {
+    "full": {"direct": 5, "stage1": 4, "reduce": 4, "final": 5},
+    "reduced": {"direct": 2, "stage1": 2, "reduce": 2, "final": 2},
+    "greedy": {"direct": 1, "stage1": 1, "reduce": 1, "final": 1},
+}
+
+# Rough seconds per generate() call of the real model on CPU, used to check
+# the latency budget. Measure your hardware with benchmark.py and pass
+# `call_seconds` to the policy.
+CALL_SECONDS = {"full": 2.0, "reduced": 0.9, "greedy": 0.4}
+
+# Tokens per stage-1 chunk (chunk_summarizer.CHUNK_MAX_TOKENS, minus some
+# room lost to whole-sentence packing)
+_CHUNK_STEP = 400
+
+
+@dataclass(frozen=True)
+class DecodingPlan:
+    """
+    Decoding settings of one request.
+
+    level : str
+        "full" | "reduced" | "greedy", the level of the final summary.
+    beams : dict
+        Beam width per stage ("direct", "stage1", "reduce", "final").
+    """
+
+    level: str
+    beams: dict
+
+    @classmethod
+    def for_level(cls, level, cheap_intermediate=False):
+        if level not in BEAMS:
+            raise ValueError("Invalid decoding level! Choose: full | reduced | greedy")
+        beams = dict(BEAMS[level])
+        if cheap_intermediate:
+            # Chunk and reduce summaries are only inputs of the final
+            # summary, so they drop one more level than the final one
+            lower = LEVELS[min(LEVELS.index(level) + 1, len(LEVELS) - 1)]
+            beams["stage1"] = BEAMS[lower]["stage1"]
+            beams["reduce"] = BEAMS[lower]["reduce"]
+        return cls(level, beams)
+
+    def generate_kwargs(self, stage):
+        """Decoding arguments of `model.generate` for one stage."""
+        num_beams = self.beams[stage]
+        # early_stopping only applies to beam search
+        return dict(num_beams=num_beams, early_stopping=num_beams > 1)
+
+    def is_full(self, stage):
+        """True if `stage` is decoded with the original (cacheable) beam width."""
+        return self.beams[stage] == BEAMS["full"][stage]
+
+    def label(self, route="chunked"):
+        """
+        Short description stored with the summary, e.g. "reduced (2 beams)".
+
+        `route` is the one reported by `summarize_text`: direct summaries
+        show the "direct" beam width, chunked ones the stage-1/final widths,
+        and cache hits only the level (their route is not known).
+        """
+        if route == "cache":
+            return f"{self.level} (cached)"
+        if route == "direct":
+            widths = [self.beams["direct"]]
+        else:
+            widths = list(dict.fromkeys([self.beams["stage1"], self.beams["final"]]))
+        beams = "/".join(str(width) for width in widths)
+        return f"{self.level} ({beams} beam{'s' if max(widths) > 1 else ''})"
+
+
+FULL_PLAN = DecodingPlan.for_level("full")
+
+
+class DecodingPolicy:
+    """
+    Chooses a DecodingPlan per request.
+
+    Parameters
+    ----------
+    busy_queue : int, optional (default=4)
+        Queue depth from which beams are reduced.
+    overloaded_queue : int, optional (default=16)
+        Queue depth from which decoding is greedy.
+    latency_budget : float, optional
+        Target seconds per request. The level is lowered until the
+        estimated time (number of generate calls x `call_seconds`) fits.
+    cheap_intermediate : bool, optional (default=False)
+        Decode stage-1 and reduce summaries one level below the final
+        summary (e.g. greedy chunks and beam-searched final summary).
+    call_seconds : dict, optional
+        Seconds per generate() call for every level (default CALL_SECONDS).
+    """
+
+    def __init__(self, busy_queue=4, overloaded_queue=16, latency_budget=None,
+                 cheap_intermediate=False, call_seconds=None):
+        self.busy_queue = busy_queue
+        self.overloaded_queue = overloaded_queue
+        self.latency_budget = latency_budget
+        self.cheap_intermediate = cheap_intermediate
+        self.call_seconds = dict(call_seconds or CALL_SECONDS)
+
+    def choose(self, num_tokens, long_text, queue_depth=0, batch_size=4):
+        """
+        Parameters
+        ----------
+        num_tokens : int
+            Input length in tokens.
+        long_text : bool
+            True if the text goes to the chunk-based summarizer.
+        queue_depth : int, optional
+            Requests waiting for inference when this one starts.
+        batch_size : int, optional
+            Stage-1 chunk batch size (for the latency estimate).
+
+        Returns
+        -------
+        DecodingPlan
+        """
+
+        if queue_depth >= self.overloaded_queue:
+            level = "greedy"
+        elif queue_depth >= self.busy_queue:
+            level = "reduced"
+        else:
+            level = "full"
+
+        if self.latency_budget is not None:
+            calls = self.estimate_calls(num_tokens, long_text, batch_size)
+            while level != "greedy" and calls * self.call_seconds[level] > self.latency_budget:
+                level = LEVELS[LEVELS.index(level) + 1]
+
+        return DecodingPlan.for_level(level, cheap_intermediate=self.cheap_intermediate)
+
+    @staticmethod
+    def estimate_calls(num_tokens, long_text, batch_size=4):
+        """Approximate number of generate() calls needed for one text."""
+        if not long_text:
+            return 1
+        num_chunks = max(1, math.ceil(num_tokens / _CHUNK_STEP))
+        # stage-1 batches, roughly one reduce level per 8 chunks, final summary
+        return math.ceil(num_chunks / batch_size) + num_chunks // 8 + 1
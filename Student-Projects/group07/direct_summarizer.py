@@ -6,43 +6,111 @@
 # Routing logic (short vs long) is handled
 
 import math
-# Import shared model and tokenizer (loaded once globally)
-from model import tokenizer, model
-# Import Persian preprocessing utilities
-from preprocess import normalize_persian_text
+from dataclasses import dataclass
+# Import shared model and tokenizer accessors (loaded once, on first use)
+from model import get_tokenizer, get_model
+# Import the shared normalize-and-tokenize-once document helpers
+from document import ensure_document, build_model_inputs
+from profiling import stage
+from decoding import FULL_PLAN
+from preprocess import SENTENCE_END_CHARS
+
+
+# Auto mode length control.
+# The summary aims at AUTO_TARGET_RATIO of the input length: once this budget
+# is reached, decoding stops at the next sentence end instead of running on
+# to the hard cap of AUTO_MAX_RATIO (the previous fixed length).
+AUTO_TARGET_RATIO = 0.2
+AUTO_MAX_RATIO = 0.25
+
+
+@dataclass
+class LengthReport:
+    """
+    Generated length of an auto-mode summary.
+
+    budget : int
+        Token budget from AUTO_TARGET_RATIO.
+    max_length : int
+        Hard cap from AUTO_MAX_RATIO.
+    generated : int
+        Tokens actually generated (without special tokens).
+    """
+
+    budget: int
+    max_length: int
+    generated: int
+
+
+class SentenceBudgetCriteria:
+    """
+    Stopping criterion for `model.generate`: a sequence is finished once
+    it has `budget` new tokens and its last token ends a sentence.
+    """
+
+    def __init__(self, budget, sentence_end_ids):
+        import torch
+
+        self.budget = budget
+        self.sentence_end_ids = torch.tensor(sorted(sentence_end_ids), dtype=torch.long)
+
+    def __call__(self, input_ids, scores=None, **kwargs):
+        import torch
+
+        # The decoder input starts with one decoder_start token
+        if input_ids.shape[1] - 1 < self.budget:
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        return torch.isin(input_ids[:, -1], self.sentence_end_ids.to(input_ids.device))
+
+
+_sentence_end_ids = {}
+
+
+def sentence_end_ids(tokenizer):
+    """Ids of all vocabulary tokens ending with sentence punctuation (cached)."""
+    key = id(tokenizer)
+    if key not in _sentence_end_ids:
+        _sentence_end_ids[key] = {
+            token_id for token, token_id in tokenizer.get_vocab().items()
+            if token[-1:] in SENTENCE_END_CHARS
+        }
+    return _sentence_end_ids[key]
 
 
 # Direct (Single‑Pass) Summarization Function
-def summarize_direct(text, mode):
+def summarize_direct(text, mode, batcher=None, decoding=None, on_length=None):
     """
     Perform direct summarization for short texts.
 
     Parameters
     ----------
-    text : str
-        Input Persian text.
+    text : str or PreparedDocument
+        Input Persian text, or a document already prepared by
+        `document.prepare_document` (then it is not tokenized again).
     mode : str
         Controls the output summary length:
             - "short"  : very concise summary
             - "medium" : balanced summary
             - "long"   : more detailed summary
             - "auto"   : summary length determined adaptively based on input size
+    batcher : batcher.GenerationBatcher, optional
+        When given, generation is handed to the batcher, which decodes this
+        request together with concurrent requests of the same mode.
+    decoding : decoding.DecodingPlan, optional
+        Beam width of the "direct" stage (default: 5 beams).
+    on_length : callable, optional
+        Called with a LengthReport (generated length versus budget)
+        after an "auto" summary.
 
     """
 
-#  Persian preprocessing
-    text = normalize_persian_text(text)
+    tokenizer = get_tokenizer()
 
-    # Tokenization
-    # The input is truncated to 512 tokens to match the model limit.
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        max_length=512
-    )
+#  Persian preprocessing and tokenization (done once per document)
+    doc = ensure_document(text, tokenizer)
 
-    input_len = inputs["input_ids"].shape[1]
+    # The input is truncated to 512 tokens to match the model limit.
+    input_len = min(doc.num_tokens, 512)
 
     # Summary length configuration based on mode
     if mode == "short":
@@ -55,25 +123,54 @@ def summarize_direct(text, mode):
         min_len, max_len = 120, 220
 
     elif mode == "auto":
-        # Generate a summary approximately 25% of the input length
-        ratio = 0.25
-        max_len = max(60, int(math.ceil(input_len * ratio)))
+        # Generate a summary of approximately 20% of the input length,
+        # never longer than 25%
+        max_len = max(60, int(math.ceil(input_len * AUTO_MAX_RATIO)))
         min_len = max(30, int(max_len * 0.6))
+        budget = min(max_len, max(min_len, int(math.ceil(input_len * AUTO_TARGET_RATIO))))
 
     else:
         raise ValueError("Invalid mode! Choose: short | medium | long | auto")
 
-    # Summary generation using beam search decoding
-    summary_ids = model.generate(
-        inputs["input_ids"],
-        attention_mask=inputs["attention_mask"],
+    # Beam search (or greedy) decoding settings
+    decoding = decoding or FULL_PLAN
+    settings = dict(
         min_length=min_len,
         max_length=max_len,
-        num_beams=5,
         no_repeat_ngram_size=3,
-        early_stopping=True
+        **decoding.generate_kwargs("direct")
     )
 
+    # Batched generation together with other concurrent requests.
+    # Auto-mode lengths depend on each input, so those requests would rarely
+    # share a batch; they are generated alone with the early-exit criterion.
+    if batcher is not None and mode != "auto":
+        return batcher.generate(doc.token_ids, **settings)
+
+    if mode == "auto":
+        from transformers import StoppingCriteriaList
+        settings["stopping_criteria"] = StoppingCriteriaList(
+            [SentenceBudgetCriteria(budget, sentence_end_ids(tokenizer))]
+        )
+
+    # Summary generation using beam search decoding
+    model = get_model()
+    inputs = build_model_inputs([doc.token_ids], tokenizer, max_length=512)
+
+    with stage("direct_generate"):
+        summary_ids = model.generate(
+            inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            **settings
+        )
+
     # Decode token IDs into readable Persian text
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+    with stage("decode"):
+        summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+
+    if mode == "auto" and on_length is not None:
+        special = set(tokenizer.all_special_ids)
+        generated = sum(1 for token in summary_ids[0].tolist() if token not in special)
+        on_length(LengthReport(budget, max_len, generated))
+
     return summary
@@ -0,0 +1,152 @@
+
+# document.py
+# This module prepares an input text once for the whole summarization pipeline.
+# Normalization and tokenization happen here a single time; the resulting
+# PreparedDocument is then shared by routing (length_router.py), chunking
+# (chunk_summarizer.py) and generation (direct_summarizer.py), so no stage has
+# to normalize, encode or decode/re-encode the same text again.
+
+
+from dataclasses import dataclass
+
+from preprocess import normalize_persian_text
+from profiling import stage
+
+
+@dataclass
+class PreparedDocument:
+    """
+    A normalized and tokenized input text.
+
+    Attributes
+    ----------
+    text : str
+        The normalized Persian text.
+    token_ids : list of int
+        Token ids of `text` without special tokens ([CLS], [SEP], ...).
+    offsets : list of (int, int) or None
+        Character span of every token inside `text`.
+        None when the tokenizer cannot report offsets (slow tokenizers).
+    num_tokens : int
+        Token count including special tokens, i.e. the same value as
+        `len(tokenizer.encode(text))`.
+    """
+
+    text: str
+    token_ids: list
+    offsets: list
+    num_tokens: int
+
+
+def prepare_document(text, tokenizer, normalize=True):
+    """
+    Normalize and tokenize `text` exactly once.
+
+    Parameters
+    ----------
+    text : str
+        The original Persian input text.
+    tokenizer : object
+        The tokenizer associated with the summarization model.
+    normalize : bool, optional (default=True)
+        Set to False when `text` was already passed through
+        `normalize_persian_text`.
+
+    Returns
+    -------
+    PreparedDocument
+    """
+
+    # Step 1. Persian normalization
+    if normalize:
+        with stage("normalize"):
+            text = normalize_persian_text(text)
+
+    # Step 2. Tokenize without special tokens so that any slice of the ids
+    # can later be wrapped into a valid model input
+    with stage("tokenize"):
+        if tokenizer.is_fast:
+            encoding = tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                verbose=False
+            )
+            offsets = encoding["offset_mapping"]
+        else:
+            encoding = tokenizer(text, add_special_tokens=False, verbose=False)
+            offsets = None
+
+    token_ids = encoding["input_ids"]
+    num_tokens = len(token_ids) + tokenizer.num_special_tokens_to_add()
+
+    return PreparedDocument(
+        text=text,
+        token_ids=token_ids,
+        offsets=offsets,
+        num_tokens=num_tokens
+    )
+
+
+def ensure_document(text, tokenizer):
+    """
+    Return `text` unchanged if it is already a PreparedDocument,
+    otherwise prepare it.
+    """
+
+    if isinstance(text, PreparedDocument):
+        return text
+    return prepare_document(text, tokenizer)
+
+
+def _add_special_tokens(ids, tokenizer):
+    # Newer tokenizers no longer expose build_inputs_with_special_tokens;
+    # bert2bert inputs are always [CLS] ... [SEP]
+    build = getattr(tokenizer, "build_inputs_with_special_tokens", None)
+    if build is not None:
+        return build(ids)
+    return [tokenizer.cls_token_id] + ids + [tokenizer.sep_token_id]
+
+
+def build_model_inputs(id_slices, tokenizer, max_length=512):
+    """
+    Turn token id slices into a padded model batch.
+
+    Every slice is truncated so that, together with the special tokens,
+    it fits into `max_length`, then wrapped with [CLS] ... [SEP] and
+    right-padded like the tokenizer itself would do.
+
+    Parameters
+    ----------
+    id_slices : list of list of int
+        Token ids without special tokens.
+    tokenizer : object
+        The tokenizer associated with the summarization model.
+    max_length : int, optional (default=512)
+        Model input limit, special tokens included.
+
+    Returns
+    -------
+    dict
+        "input_ids" and "attention_mask" tensors of shape (batch, seq_len).
+    """
+
+    import torch
+
+    budget = max_length - tokenizer.num_special_tokens_to_add()
+    sequences = [
+        _add_special_tokens(list(ids[:budget]), tokenizer)
+        for ids in id_slices
+    ]
+
+    seq_len = max(len(seq) for seq in sequences)
+    input_ids = torch.full(
+        (len(sequences), seq_len), tokenizer.pad_token_id, dtype=torch.long
+    )
+    attention_mask = torch.zeros((len(sequences), seq_len), dtype=torch.long)
+
+    for row, seq in enumerate(sequences):
+        input_ids[row, :len(seq)] = torch.tensor(seq, dtype=torch.long)
+        attention_mask[row, :len(seq)] = 1
+
+    return {"input_ids": input_ids, "attention_mask": attention_mask}
@@ -0,0 +1,174 @@
+
+# history_store.py
+# Per-user summary history for the Telegram bot.
+# History used to live in an unbounded in-process dict holding every original
+# text forever and was lost on restart. Stores here keep a bounded number of
+# entries per user, list them page by page (time and mode only) and load the
+# full text and summary only when a single entry is opened. Every entry also
+# records the decoding plan its summary was generated with (decoding.py).
+
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+
+class SQLiteHistoryStore:
+    """
+    History stored in a SQLite file (WAL mode, safe to share between threads).
+
+    Parameters
+    ----------
+    path : str, optional (default="history.sqlite3")
+        Database file.
+    max_entries_per_user : int, optional (default=200)
+        Oldest entries of a user are deleted above this number.
+    """
+
+    def __init__(self, path="history.sqlite3", max_entries_per_user=200):
+        self.max_entries_per_user = max_entries_per_user
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets readers proceed while an entry is being written
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "user_id INTEGER NOT NULL, "
+            "time TEXT NOT NULL, "
+            "mode TEXT NOT NULL, "
+            "text TEXT NOT NULL, "
+            "summary TEXT NOT NULL, "
+            "decoding TEXT)"
+        )
+        # Databases created before the decoding column existed
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(history)")]
+        if "decoding" not in columns:
+            self._db.execute("ALTER TABLE history ADD COLUMN decoding TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS history_user ON history (user_id, id)")
+        self._db.commit()
+
+    def add(self, user_id, text, summary, mode, time, decoding=None):
+        """Store one entry and return its id."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO history (user_id, time, mode, text, summary, decoding) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, time, mode, text, summary, decoding),
+            )
+            # Retention cap: keep only the newest entries of this user
+            self._db.execute(
+                "DELETE FROM history WHERE user_id = ? AND id NOT IN ("
+                "SELECT id FROM history WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+                (user_id, user_id, self.max_entries_per_user),
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def count(self, user_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM history WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0]
+
+    def page(self, user_id, page, page_size=8):
+        """
+        Entries of one page, newest first, without text and summary.
+
+        Returns
+        -------
+        list of dict
+            {"id", "time", "mode"} for every entry of the page.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, time, mode FROM history WHERE user_id = ? "
+                "ORDER BY id DESC LIMIT ? OFFSET ?",
+                (user_id, page_size, page * page_size),
+            ).fetchall()
+        return [{"id": r[0], "time": r[1], "mode": r[2]} for r in rows]
+
+    def get(self, user_id, entry_id):
+        """Full entry ({"id", "time", "mode", "text", "summary", "decoding"}) or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, time, mode, text, summary, decoding FROM history "
+                "WHERE user_id = ? AND id = ?",
+                (user_id, entry_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "time": row[1], "mode": row[2],
+            "text": row[3], "summary": row[4], "decoding": row[5],
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class MemoryHistoryStore:
+    """
+    Same interface as SQLiteHistoryStore, kept in memory (lost on restart).
+    Memory stays bounded by `max_entries_per_user` per user.
+    """
+
+    def __init__(self, max_entries_per_user=200):
+        self.max_entries_per_user = max_entries_per_user
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._next_id = 1
+
+    def add(self, user_id, text, summary, mode, time, decoding=None):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            user_entries = self._entries.setdefault(user_id, OrderedDict())
+            user_entries[entry_id] = {
+                "id": entry_id, "time": time, "mode": mode,
+                "text": text, "summary": summary, "decoding": decoding,
+            }
+            while len(user_entries) > self.max_entries_per_user:
+                user_entries.popitem(last=False)
+            return entry_id
+
+    def count(self, user_id):
+        return len(self._entries.get(user_id, ()))
+
+    def page(self, user_id, page, page_size=8):
+        with self._lock:
+            newest_first = reversed(self._entries.get(user_id, OrderedDict()).values())
+            items = list(islice(newest_first, page * page_size, (page + 1) * page_size))
+        return [{"id": e["id"], "time": e["time"], "mode": e["mode"]} for e in items]
+
+    def get(self, user_id, entry_id):
+        entry = self._entries.get(user_id, {}).get(entry_id)
+        return dict(entry) if entry is not None else None
+
+    def close(self):
+        pass
+
+
+def create_history_store(backend="sqlite", **kwargs):
+    """
+    Build a history store.
+
+    Parameters
+    ----------
+    backend : str, optional (default="sqlite")
+        "sqlite" (persistent) or "memory".
+    **kwargs
+        Passed to the store class (e.g. path, max_entries_per_user).
+    """
+
+    if backend == "sqlite":
+        return SQLiteHistoryStore(**kwargs)
+    elif backend == "memory":
+        return MemoryHistoryStore(**kwargs)
+    else:
+        raise ValueError("Invalid history backend! Choose: sqlite | memory")
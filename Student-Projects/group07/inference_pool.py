@@ -0,0 +1,181 @@
+
+# inference_pool.py
+# This module runs blocking model inference outside the bot's event loop.
+# Telegram handlers are async: calling generate() directly inside them would
+# freeze the whole bot while one beam search runs. The InferencePool keeps a
+# bounded per-user job queue, serves users round-robin so one heavy user cannot
+# starve the others, and executes jobs on a dedicated executor.
+
+
+import asyncio
+import functools
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolSaturated(Exception):
+    """Raised when a job cannot be queued (global or per-user limit reached)."""
+
+
+class InferencePool:
+    """
+    Bounded, per-user fair queue in front of an inference executor.
+
+    Parameters
+    ----------
+    max_workers : int, optional (default=1)
+        Number of jobs running at the same time.
+        One worker is enough for a single shared CPU model.
+    max_queue : int, optional (default=32)
+        Maximum number of waiting jobs over all users.
+    max_per_user : int, optional (default=2)
+        Maximum number of waiting jobs for one user.
+    executor : concurrent.futures.Executor, optional
+        Executor used to run jobs. A thread pool with `max_workers`
+        threads is created when omitted.
+    """
+
+    def __init__(self, max_workers=1, max_queue=32, max_per_user=2, executor=None):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="inference"
+        )
+
+        # user_id -> deque of waiting jobs; the dict order is the round-robin order
+        self._queues = OrderedDict()
+        self._waiting = 0
+        self._running = 0
+
+        # Created on first submit, inside the running event loop
+        self._available = None
+        self._workers = []
+
+    @property
+    def queue_depth(self):
+        """Number of jobs waiting for a worker."""
+        return self._waiting
+
+    @property
+    def running(self):
+        """Number of jobs currently executing."""
+        return self._running
+
+    def submit(self, user_id, fn, *args, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)` for `user_id`.
+
+        Must be called from the running event loop.
+
+        Returns
+        -------
+        (asyncio.Future, int)
+            The future resolving to the job result, and the job's position
+            in the queue (0 means it starts immediately).
+
+        Raises
+        ------
+        PoolSaturated
+            If the global or the per-user queue limit is reached.
+        """
+
+        user_queue = self._queues.get(user_id, ())
+        if self._waiting >= self.max_queue or len(user_queue) >= self.max_per_user:
+            raise PoolSaturated(f"inference queue is full ({self._waiting} waiting)")
+
+        self._start_workers()
+
+        position = self._position_of_next(user_id)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job = (future, functools.partial(fn, *args, **kwargs))
+
+        if user_id not in self._queues:
+            self._queues[user_id] = deque()
+        self._queues[user_id].append(job)
+        self._waiting += 1
+        self._available.release()
+
+        return future, position
+
+    async def run(self, user_id, fn, *args, **kwargs):
+        """Queue a job and wait for its result."""
+        future, _ = self.submit(user_id, fn, *args, **kwargs)
+        return await future
+
+    def shutdown(self):
+        """Stop the workers and the executor. Waiting jobs are cancelled."""
+        for task in self._workers:
+            task.cancel()
+        self._workers = []
+
+        for user_queue in self._queues.values():
+            for future, _ in user_queue:
+                future.cancel()
+        self._queues.clear()
+        self._waiting = 0
+
+        self._executor.shutdown(wait=False)
+
+    # ---------------- internals ----------------
+
+    def _position_of_next(self, user_id):
+        # Jobs that would be served before a new job of this user.
+        # With round-robin, a user's k-th waiting job runs in the k-th round,
+        # after at most k + 1 jobs of every other user.
+        if self._running < self.max_workers and self._waiting == 0:
+            return 0
+
+        own = len(self._queues.get(user_id, ()))
+        ahead = own + sum(
+            min(len(q), own + 1)
+            for uid, q in self._queues.items() if uid != user_id
+        )
+        return ahead + 1
+
+    def _start_workers(self):
+        if self._workers:
+            return
+        self._available = asyncio.Semaphore(0)
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.max_workers)
+        ]
+
+    def _next_job(self):
+        # Take the first user in round-robin order, then move them to the back
+        user_id, user_queue = next(iter(self._queues.items()))
+        job = user_queue.popleft()
+        if user_queue:
+            self._queues.move_to_end(user_id)
+        else:
+            del self._queues[user_id]
+        self._waiting -= 1
+        return job
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._available.acquire()
+            future, call = self._next_job()
+
+            # The handler gave up waiting (e.g. the bot is stopping)
+            if future.cancelled():
+                continue
+
+            self._running += 1
+            try:
+                result = await loop.run_in_executor(self._executor, call)
+            except Exception as exc:
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._running -= 1
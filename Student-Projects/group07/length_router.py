@@ -1,23 +1,176 @@
+
 # length_router.py
 # This module is responsible for making a lightweight routing decision based on token length.
 # It determines whether a given Persian text should be processed by the direct summarization pipeline or the chunk-based one.
+#
+# For a raw string the decision does not need the full token count: the word
+# and character counts bound it from below and above, so obvious cases are
+# decided without tokenizing, and near the threshold the text is tokenized
+# piece by piece only until the threshold is crossed.
+# A PreparedDocument (pipeline.summarize_text tokenizes every text once for
+# generation anyway) is routed on its exact token count.
+
 
+import unicodedata
+from dataclasses import dataclass
 
 from preprocess import normalize_persian_text
+from document import PreparedDocument
+
+
+# Characters tokenized per step when counting tokens incrementally
+PIECE_CHARS = 2000
+
+
+@dataclass
+class LengthBounds:
+    """
+    Tokens-per-word bounds used to estimate a token count from a word count.
+
+    The defaults always hold for the WordPiece tokenizer of the model: every
+    whitespace-separated word with a visible character gives at least one
+    token, and every token covers at least one visible character (the
+    character bound is applied in any case). Format and control characters
+    (e.g. U+200F) are dropped by the tokenizer, so they are not counted.
+    `calibrate_bounds` measures tighter ratios on sample texts.
+    """
+
+    min_tokens_per_word: float = 1.0
+    max_tokens_per_word: float = None
+
+
+DEFAULT_BOUNDS = LengthBounds()
+
+
+def calibrate_bounds(texts, tokenizer, margin=0.1):
+    """
+    Measure tokens-per-word ratios on sample texts.
+
+    Parameters
+    ----------
+    texts : iterable of str
+        Representative inputs (e.g. recent user messages).
+    tokenizer : object
+        The tokenizer of the summarization model.
+    margin : float, optional (default=0.1)
+        Relative safety margin applied to the observed minimum and maximum.
+
+    Returns
+    -------
+    LengthBounds
+    """
+
+    ratios = []
+    for text in texts:
+        text = normalize_persian_text(text)
+        if not text:
+            continue
+        words, _ = count_words_and_chars(text)
+        if not words:
+            continue
+        tokens = len(tokenizer.encode(text, add_special_tokens=False))
+        ratios.append(tokens / words)
+
+    if not ratios:
+        return LengthBounds()
+
+    return LengthBounds(
+        min_tokens_per_word=max(1.0, min(ratios) * (1 - margin)),
+        max_tokens_per_word=max(ratios) * (1 + margin),
+    )
+
 
+def _is_visible(char):
+    # The tokenizer removes format (Cf) and control (Cc) characters and the
+    # replacement character, and splits at whitespace
+    return (
+        unicodedata.category(char)[0] != "C"
+        and char != "\ufffd"
+        and not char.isspace()
+    )
 
-def is_long_text(text, tokenizer, threshold_tokens=450):
+
+def count_words_and_chars(text):
+    """
+    Number of words and of characters of a normalized text that the
+    tokenizer keeps (words made only of invisible characters are skipped).
+    """
+
+    if not text:
+        return 0, 0
+
+    # Common case: printable text with single spaces between words
+    if text.isprintable() and "\ufffd" not in text:
+        spaces = text.count(" ")
+        return spaces + 1, len(text) - spaces
+
+    words = chars = 0
+    for word in text.split(" "):
+        visible = sum(1 for char in word if _is_visible(char))
+        words += visible > 0
+        chars += visible
+    return words, chars
+
+
+def estimate_token_range(text, bounds=DEFAULT_BOUNDS):
+    """
+    Lower and upper bound of the token count (without special tokens)
+    of a normalized text, computed from its word and character counts.
+    """
+
+    words, chars = count_words_and_chars(text)
+    if not words:
+        return 0, 0
+
+    low = int(words * bounds.min_tokens_per_word)
+    high = chars
+    if bounds.max_tokens_per_word is not None:
+        high = min(high, int(words * bounds.max_tokens_per_word) + 1)
+
+    return low, max(low, high)
+
+
+def count_tokens_until(text, tokenizer, limit, piece_chars=PIECE_CHARS):
+    """
+    Count the tokens of `text` (without special tokens), tokenizing it piece
+    by piece and stopping as soon as the count exceeds `limit`.
+
+    Pieces end at spaces; the model's tokenizer never merges tokens across
+    whitespace, so the sum of the pieces equals the count of the whole text.
+    """
+
+    count = 0
+    start = 0
+    while start < len(text):
+        end = text.find(" ", start + piece_chars)
+        if end == -1:
+            end = len(text)
+
+        count += len(tokenizer.encode(text[start:end], add_special_tokens=False))
+        if count > limit:
+            break
+
+        start = end + 1
+
+    return count
+
+
+def is_long_text(text, tokenizer, threshold_tokens=450, bounds=None):
     """
 
     Parameters
     ----------
-    text : str
-        The original Persian input text.
+    text : str or PreparedDocument
+        The original Persian input text, or a document prepared by
+        `document.prepare_document` whose token count is reused as is.
     tokenizer : object
         The tokenizer associated with the summarization model,
         used to count tokens accurately.
     threshold_tokens : int, optional (default=450)
         The token length above which the text is labeled as "long".
+    bounds : LengthBounds, optional
+        Tokens-per-word bounds for the estimate (default DEFAULT_BOUNDS,
+        or the result of `calibrate_bounds`).
 
     Returns
     -------
@@ -26,12 +179,21 @@ def is_long_text(text, tokenizer, threshold_tokens=450):
         False -> otherwise.
     """
 
-    # Step 1. Normalize text before tokenization
-    text = normalize_persian_text(text)
+    # A prepared document already carries its token count
+    if isinstance(text, PreparedDocument):
+        return text.num_tokens > threshold_tokens
 
-    # Step 2. Count tokens using the model's tokenizer
-    token_count = len(tokenizer.encode(text))
+    # Step 1. Normalize text before counting
+    text = normalize_persian_text(text)
 
-    # Step 3. Return routing decision
+    # Step 2. Decide obvious cases from the word and character counts
     # If the token count exceeds 450 (by default), the system routes the text to the chunk-based summarizer.
-    return token_count > threshold_tokens
+    limit = threshold_tokens - tokenizer.num_special_tokens_to_add()
+    low, high = estimate_token_range(text, bounds or DEFAULT_BOUNDS)
+    if low > limit:
+        return True
+    if high <= limit:
+        return False
+
+    # Step 3. Near the threshold, count tokens until the threshold is crossed
+    return count_tokens_until(text, tokenizer, limit) > limit
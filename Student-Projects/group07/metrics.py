@@ -0,0 +1,302 @@
+
+# metrics.py
+# In-process metrics for the Telegram bot.
+# A small registry of counters, gauges and histograms (with labels) rendered
+# in the Prometheus text format and served on a local HTTP endpoint, so a
+# Prometheus server (or curl) can see request rates, queue and generation
+# latency, token counts and cache hit rates. Pipeline stages timed with
+# profiling.stage() are recorded too and can optionally be exported as
+# OpenTelemetry spans.
+
+
+import bisect
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import profiling
+
+
+# Latency buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120)
+# Token count buckets
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+# Chunks per request
+CHUNK_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for _, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        # Unlabeled counters and gauges are exported as 0 before first use
+        if not self.labelnames and self.kind != "histogram":
+            self._values[()] = 0
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_one(key, value))
+        return lines
+
+    def _render_one(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count (requests, errors, tokens)."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (in-flight requests, queue depth)."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _render_one(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def on_collect(self, callback):
+        """Register `callback()`, called before every render (e.g. to set gauges)."""
+        self._collectors.append(callback)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        for callback in list(self._collectors):
+            callback()
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ---------------- summarizer metrics ----------------
+
+REQUESTS = REGISTRY.counter(
+    "summarizer_requests_total", "Summarization requests.", ("mode", "route", "status")
+)
+ERRORS = REGISTRY.counter(
+    "summarizer_errors_total", "Failed summarization requests.", ("mode", "error")
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "summarizer_in_flight", "Requests queued or running in the inference pool."
+)
+QUEUE_SECONDS = REGISTRY.histogram(
+    "summarizer_queue_seconds", "Time from submission until inference starts.", ("mode",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "summarizer_request_seconds", "Inference time per request.", ("mode", "route")
+)
+TOKENS_IN = REGISTRY.histogram(
+    "summarizer_input_tokens", "Input tokens per request.", ("route",), TOKEN_BUCKETS
+)
+TOKENS_OUT = REGISTRY.histogram(
+    "summarizer_output_tokens", "Summary tokens per request.", ("route",), TOKEN_BUCKETS
+)
+CHUNKS = REGISTRY.histogram(
+    "summarizer_chunks", "Stage-1 chunks per long text.", (), CHUNK_BUCKETS
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "summarizer_stage_seconds",
+    "Pipeline stage durations (normalize, tokenize, generate, decode).",
+    ("stage",),
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "summarizer_queue_depth", "Jobs waiting for an inference worker."
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "summarizer_cache_lookups_total", "Summary cache lookups.", ("kind", "result")
+)
+
+
+def watch_pool(pool):
+    """Report the queue depth of an inference_pool.InferencePool on every scrape."""
+    REGISTRY.on_collect(lambda: QUEUE_DEPTH.set(pool.queue_depth))
+
+
+def watch_cache(cache):
+    """Count the hits and misses of a summary_cache.SummaryCache on every scrape."""
+
+    # The cache keeps running totals; the counter advances by what is new
+    seen = {}
+    lock = threading.Lock()
+
+    def collect():
+        with lock:
+            stats = cache.stats()
+            for kind in ("summary", "chunk"):
+                for result, field in (("hit", "hits"), ("miss", "misses")):
+                    total = stats[kind][field]
+                    CACHE_LOOKUPS.inc(total - seen.get((kind, result), 0), kind=kind, result=result)
+                    seen[kind, result] = total
+
+    REGISTRY.on_collect(collect)
+
+
+def record_stages():
+    """Record every profiling.stage() of this process in STAGE_SECONDS."""
+    profiling.add_listener(lambda name, seconds: STAGE_SECONDS.observe(seconds, stage=name))
+
+
+def enable_tracing(service_name="group07-summarizer"):
+    """
+    Export every profiling.stage() as an OpenTelemetry span.
+
+    The OpenTelemetry SDK and exporter are configured by the application
+    (e.g. with opentelemetry-instrument); without them spans are no-ops.
+    """
+
+    try:
+        from opentelemetry import trace
+    except ImportError as exc:
+        raise ImportError("Tracing requires: pip install opentelemetry-api") from exc
+
+    profiling.set_tracer(trace.get_tracer(service_name))
+
+
+# ---------------- HTTP endpoint ----------------
+
+def _handler(registry):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the bot's output
+            pass
+
+    return MetricsHandler
+
+
+def serve(port=9464, host="127.0.0.1", registry=REGISTRY):
+    """
+    Serve `registry` at http://host:port/metrics from a daemon thread.
+
+    Returns
+    -------
+    http.server.ThreadingHTTPServer
+        Call `shutdown()` on it to stop serving.
+    """
+
+    server = ThreadingHTTPServer((host, port), _handler(registry))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
@@ -2,7 +2,11 @@
 # model.py
 # This module loads the Persian summarization model and tokenizer.
 # It serves as the central NLP backbone shared across all other modules.
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+# Nothing is loaded at import time: the tokenizer and the model are loaded
+# lazily on first use (or by warm_up()), so importing any module is fast.
+import os
+import re
+import threading
 
 
 # Define the model to use for Persian text summarization.
@@ -11,9 +15,169 @@ from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 MODEL_NAME = "m3hrdadfi/bert2bert-fa-wiki-summary"
 
 
-# Load the tokenizer and model from Hugging Face Transformers.
+# Inference backend, selected with the SUMMARIZER_BACKEND environment variable:
+#   "pytorch" : full fp32 PyTorch model (default)
+#   "int8"    : PyTorch model with dynamic int8 quantization of all Linear layers
+#               (smaller and faster on CPU-only hosts)
+#   "onnx"    : ONNX Runtime encoder-decoder exported with Hugging Face Optimum
+#               (pip install optimum[onnxruntime])
+BACKENDS = ("pytorch", "int8", "onnx")
+BACKEND = os.environ.get("SUMMARIZER_BACKEND", "pytorch")
+
+# Where exported ONNX models are stored, so each export runs only once.
+# Every model gets its own subdirectory; relative paths are resolved against
+# this module's directory rather than the working directory.
+ONNX_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    os.environ.get("SUMMARIZER_ONNX_DIR", "onnx_model"),
+)
+# Written after a finished export; names the model the export came from
+ONNX_SOURCE_FILE = "source_model.txt"
+
+
+def onnx_export_dir(model_name=MODEL_NAME):
+    """Directory of the ONNX export of `model_name` (a model id or local path)."""
+    return os.path.join(ONNX_DIR, re.sub(r"[^\w.-]+", "--", model_name).strip("-"))
+
+
+def _read_onnx_source(export_dir):
+    try:
+        with open(os.path.join(export_dir, ONNX_SOURCE_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def load_model(model_name=MODEL_NAME, backend=BACKEND):
+    """
+    Load the summarization model for the requested backend.
+
+    Every backend returns an object with the same `generate(input_ids,
+    attention_mask=..., ...)` interface used by both summarizers.
+
+    Parameters
+    ----------
+    model_name : str
+        Hugging Face model id or local path.
+    backend : str
+        One of BACKENDS.
+    """
+
+    from transformers import AutoModelForSeq2SeqLM
+
+    if backend == "pytorch":
+        return AutoModelForSeq2SeqLM.from_pretrained(model_name)
+
+    elif backend == "int8":
+        import torch
+
+        fp32_model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        # Weights of Linear layers are stored as int8; activations are
+        # quantized on the fly, which is what speeds up CPU decoding
+        return torch.ao.quantization.quantize_dynamic(
+            fp32_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+    elif backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as exc:
+            raise ImportError(
+                "The onnx backend requires: pip install optimum[onnxruntime]"
+            ) from exc
+
+        # Reuse a finished export of the same model; anything else
+        # (an interrupted export, a different model) is exported again
+        export_dir = onnx_export_dir(model_name)
+        if _read_onnx_source(export_dir) == model_name:
+            return ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+
+        ort_model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        ort_model.save_pretrained(export_dir)
+        with open(os.path.join(export_dir, ONNX_SOURCE_FILE), "w", encoding="utf-8") as f:
+            f.write(model_name + "\n")
+        return ort_model
+
+    else:
+        raise ValueError(f"Invalid backend {backend!r}! Choose: {' | '.join(BACKENDS)}")
+
+
+# Lazily-initialized tokenizer and model.
 # The tokenizer converts input Persian text into tokens usable by the model.
 # The model generates the summarization output sequence.
-# They are loaded here once and imported by other modules,
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+# Each one is loaded once, on first use, and shared by all other modules.
+# Separate locks let tokenizer-only callers (e.g. length routing) proceed
+# while the much larger model is still loading.
+_tokenizer = None
+_model = None
+_tokenizer_lock = threading.Lock()
+_model_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """Return the shared tokenizer, loading it on first call."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    return _tokenizer
+
+
+def get_model():
+    """Return the shared model, loading it on first call."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_model(MODEL_NAME, BACKEND)
+    return _model
+
+
+def set_model(tokenizer=None, model=None):
+    """
+    Install an already loaded tokenizer and/or model instead of loading
+    MODEL_NAME (e.g. the tiny offline model of the benchmark harness).
+    """
+    global _tokenizer, _model
+    if tokenizer is not None:
+        _tokenizer = tokenizer
+    if model is not None:
+        _model = model
+
+
+def is_ready():
+    """True once both the tokenizer and the model are loaded."""
+    return _tokenizer is not None and _model is not None
+
+
+def warm_up(background=True):
+    """
+    Load the tokenizer and the model ahead of the first request.
+
+    With `background=True` loading runs in a daemon thread and this
+    function returns immediately; requests arriving meanwhile simply
+    wait for the load to finish.
+    """
+
+    def _load():
+        get_tokenizer()
+        get_model()
+
+    if not background:
+        _load()
+        return None
+
+    thread = threading.Thread(target=_load, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # Backwards compatibility for `import model; model.tokenizer / model.model`
+    if name == "tokenizer":
+        return get_tokenizer()
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
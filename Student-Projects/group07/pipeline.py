@@ -0,0 +1,113 @@
+
+# pipeline.py
+# Single entry point for summarizing one text.
+# The text is normalized and tokenized once (document.py), routed by length
+# (length_router.py) and handed to the direct or chunk-based summarizer,
+# all of them working on the same prepared document. An optional decoding
+# policy (decoding.py) picks the beam widths from the current load.
+
+
+from model import get_tokenizer
+from preprocess import normalize_persian_text
+from document import prepare_document
+from length_router import is_long_text
+from direct_summarizer import summarize_direct
+from chunk_summarizer import summarize_chunked
+from profiling import stage
+from decoding import FULL_PLAN
+
+
+def summarize_text(text, mode, cache=None, on_progress=None, batcher=None,
+                   decoding=None, queue_depth=0, on_decoding=None, on_route=None,
+                   on_output=None):
+    """
+    Summarize a Persian text with the pipeline chosen by its length.
+
+    Parameters
+    ----------
+    text : str
+        The original Persian input text.
+    mode : str
+        "short" | "medium" | "long" | "auto"
+    cache : SummaryCache, optional
+        When given, the final summary is looked up by normalized text and
+        mode before running the model, and stage-1 chunk summaries of long
+        texts are reused across modes with the same chunk lengths.
+    on_progress : callable, optional
+        Called with every chunk_summarizer.ProgressEvent while a long
+        text is summarized (not called for short texts or cache hits).
+    batcher : batcher.GenerationBatcher, optional
+        When given, short texts are generated in micro-batches together
+        with concurrent requests of the same mode.
+    decoding : decoding.DecodingPolicy, optional
+        Chooses the decoding plan from `queue_depth` and the input length.
+        Without it every stage uses full beam search.
+    queue_depth : int, optional
+        Requests waiting for inference, passed to the policy.
+    on_decoding : callable, optional
+        Called with the DecodingPlan used for this text (FULL_PLAN for
+        cache hits, since only full-quality summaries are cached).
+    on_route : callable, optional
+        Called with `(route, num_tokens)`: route is "direct", "chunked" or
+        "cache" (then num_tokens is None, the text is not tokenized).
+    on_output : callable, optional
+        Called with the number of tokens of the summary (special tokens
+        excluded), counted where the summary is made (e.g. in a worker
+        process).
+
+    Returns
+    -------
+    str
+        The generated summary.
+    """
+
+    # Normalize first: the cache key does not need tokenization
+    with stage("normalize"):
+        normalized = normalize_persian_text(text)
+
+    if cache is not None:
+        summary = cache.get_summary(normalized, mode)
+        if summary is not None:
+            if on_decoding is not None:
+                on_decoding(FULL_PLAN)
+            if on_route is not None:
+                on_route("cache", None)
+            if on_output is not None:
+                on_output(count_tokens(summary))
+            return summary
+
+    # Tokenize once for routing, chunking and generation
+    tokenizer = get_tokenizer()
+    doc = prepare_document(normalized, tokenizer, normalize=False)
+
+    long_text = is_long_text(doc, tokenizer)
+
+    plan = FULL_PLAN
+    if decoding is not None:
+        plan = decoding.choose(doc.num_tokens, long_text, queue_depth=queue_depth)
+    if on_decoding is not None:
+        on_decoding(plan)
+    if on_route is not None:
+        on_route("chunked" if long_text else "direct", doc.num_tokens)
+
+    if long_text:
+        summary = summarize_chunked(
+            doc, mode=mode, cache=cache, on_progress=on_progress, decoding=plan
+        )
+    else:
+        summary = summarize_direct(doc, mode=mode, batcher=batcher, decoding=plan)
+
+    # Degraded summaries are not cached: a later request may get full quality
+    stages = ("stage1", "reduce", "final") if long_text else ("direct",)
+    if cache is not None and all(plan.is_full(name) for name in stages):
+        cache.put_summary(normalized, mode, summary)
+
+    if on_output is not None:
+        on_output(count_tokens(summary))
+
+    return summary
+
+
+def count_tokens(text):
+    """Number of tokens of `text` without special tokens."""
+    return len(get_tokenizer().encode(text, add_special_tokens=False))
@@ -3,22 +3,71 @@
 # This module provides text normalization utilities specifically
 # designed for Persian text.
 # The goal of preprocessing is to reduce noise and inconsistencies before the text is passed to the summarization model.
+#
+# Every rule is prepared once at import time: the character replacements are
+# a precomputed list of pairs and the symbol pattern is compiled once.
+# str.replace is used instead of one str.translate table: on Persian
+# (non-ASCII) text translate does a per-character dict lookup and was
+# measured slower than the original code (see bench_preprocess.py).
 
 
 import re
 
-def normalize_persian_text(text, remove_half_space=True, remove_symbols=True):
+
+# Zero Width Non-Joiner (half-space)
+HALF_SPACE = '\u200c'
+
+# Arabic characters and their Persian equivalents
+ARABIC_TO_PERSIAN = {
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ؤ': 'و',
+    'إ': 'ا',
+    'أ': 'ا',
+}
+
+# Arabic-Indic digits (٠-٩) and their Persian forms (۰-۹)
+ARABIC_TO_PERSIAN_DIGITS = {
+    chr(0x0660 + i): chr(0x06F0 + i) for i in range(10)
+}
+
+_LETTER_PAIRS = tuple(ARABIC_TO_PERSIAN.items())
+_DIGIT_PAIRS = tuple(ARABIC_TO_PERSIAN_DIGITS.items())
+
+# Characters that end a Persian sentence ('؟' question mark, '؛' semicolon);
+# normalization keeps all of them
+SENTENCE_END_CHARS = ".!?؟؛"
+
+# Unnecessary symbols (sentence punctuation such as '.' and '?' is kept)
+_SYMBOLS_RE = re.compile(r'[\"\'\(\)\[\]\{\}\*_,;:«»]')
+
+
+def _replace_chars(text, pairs):
+    for src, tgt in pairs:
+        # The membership test is a fast C scan; most texts contain few
+        # of these characters, so most replace() calls are skipped
+        if src in text:
+            text = text.replace(src, tgt)
+    return text
+
+
+def normalize_persian_text(text, remove_half_space=True, remove_symbols=True,
+                           normalize_digits=True):
     """
     Parameters
     ----------
-    text : str    
+    text : str
     remove_half_space : bool, optional (default=True)
-        If True, removes the Zero Width Non-Joiner character (\u200c),
+        If True, removes the Zero Width Non-Joiner character (‌),
         replacing it with a regular space.
         This helps avoid tokenization inconsistencies.
     remove_symbols : bool, optional (default=True)
         If True, removes unnecessary symbols while preserving
         sentence‑level punctuation such as periods and question marks.
+    normalize_digits : bool, optional (default=True)
+        If True, replaces Arabic-Indic digits with their Persian forms.
 
     Returns
     -------
@@ -27,26 +76,46 @@ def normalize_persian_text(text, remove_half_space=True, remove_symbols=True):
     """
 
     # 1. Remove Zero Width Non-Joiner (half‑space)
-    if remove_half_space:
-        text = text.replace('\u200c', ' ')
-
-    # 2. Normalize Arabic characters to their Persian equivalents
-    replacements = {
-        'ي': 'ی',
-        'ك': 'ک',
-        'ة': 'ه',
-        'ؤ': 'و',
-        'إ': 'ا',
-        'أ': 'ا'
-    }
-    for src, tgt in replacements.items():
-        text = text.replace(src, tgt)
+    if remove_half_space and HALF_SPACE in text:
+        text = text.replace(HALF_SPACE, ' ')
+
+    # 2. Normalize Arabic characters (and digits) to their Persian equivalents
+    text = _replace_chars(text, _LETTER_PAIRS)
+    if normalize_digits:
+        text = _replace_chars(text, _DIGIT_PAIRS)
 
     # 3. Remove unnecessary symbols (keep '.' and '?')
     if remove_symbols:
-        text = re.sub(r'[\"\'\(\)\[\]\{\}\*_,;:«»]', '', text)
+        text = _SYMBOLS_RE.sub('', text)
 
     # 4. Normalize whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    # split() breaks on the same characters as \s+ and is ~3x faster
+    return ' '.join(text.split())
 
-    return text
+
+def normalize_persian_texts(texts, remove_half_space=True, remove_symbols=True,
+                            normalize_digits=True):
+    """
+    Batch version of `normalize_persian_text`.
+
+    Parameters
+    ----------
+    texts : iterable of str
+        The texts to normalize.
+    Other parameters are the same as in `normalize_persian_text`.
+
+    Returns
+    -------
+    list of str
+        The normalized texts, in the same order.
+    """
+
+    return [
+        normalize_persian_text(
+            text,
+            remove_half_space=remove_half_space,
+            remove_symbols=remove_symbols,
+            normalize_digits=normalize_digits,
+        )
+        for text in texts
+    ]
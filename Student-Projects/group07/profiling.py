@@ -0,0 +1,50 @@
+
+# profiling.py
+# Lightweight stage timing hooks for the summarization pipeline.
+# The pipeline wraps its stages (normalize, tokenize, generate, decode) in
+# `stage(name)`. Without listeners this costs next to nothing; the benchmark
+# harness (and any other consumer) registers a listener to receive
+# (stage name, elapsed seconds) for every finished stage. With a tracer set
+# (see metrics.enable_tracing), every stage is also an OpenTelemetry span.
+
+
+import time
+from contextlib import contextmanager, nullcontext
+
+
+_listeners = []
+_tracer = None
+
+
+def add_listener(listener):
+    """Register `listener(name, seconds)`, called after every stage."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def set_tracer(tracer):
+    """Open a span of `tracer` (OpenTelemetry API) around every stage; None disables."""
+    global _tracer
+    _tracer = tracer
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block and report it to all listeners."""
+    if _tracer is None and not _listeners:
+        yield
+        return
+
+    span = _tracer.start_as_current_span(name) if _tracer is not None else nullcontext()
+    start = time.perf_counter()
+    try:
+        with span:
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for listener in list(_listeners):
+            listener(name, elapsed)
@@ -0,0 +1,146 @@
+
+# rate_limit.py
+# Admission control for the Telegram bot.
+# Every mode button press used to start a full model run, so a few users
+# tapping repeatedly could fill the inference queue for everyone. This module
+# provides a per-user token bucket (how often a user may start a summary),
+# a global cap on summaries in flight, and coalescing of identical in-flight
+# requests (same user, text and mode) onto one computation.
+
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """
+    Per-user token bucket.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second (sustained requests per second per user).
+    burst : int
+        Bucket capacity (requests a user may send at once).
+    max_users : int, optional (default=10000)
+        Buckets of the least recently seen users are dropped above this
+        number; a dropped bucket simply starts full again.
+    """
+
+    def __init__(self, rate, burst, max_users=10000):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = OrderedDict()  # user_id -> (tokens, last update)
+        self._lock = threading.Lock()
+
+    def acquire(self, user_id, cost=1):
+        """
+        Take `cost` tokens from the user's bucket.
+
+        Returns
+        -------
+        float
+            0 if the request is allowed, otherwise the seconds to wait
+            until it would be.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(user_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.rate
+
+            self._buckets[user_id] = (tokens, now)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+
+class ConcurrencyCap:
+    """Non-blocking limit on the number of summaries in flight over all users."""
+
+    def __init__(self, limit):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self._active
+
+    def try_acquire(self):
+        """Take a slot; False if `limit` summaries are already in flight."""
+        with self._lock:
+            if self._active >= self.limit:
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+
+class RequestCoalescer:
+    """
+    Identical in-flight requests share one computation.
+
+    The bot registers the future of a running summary under its
+    (user, text, mode) key; a repeated request finds it and awaits the same
+    result instead of starting another model run. Keys are removed as soon
+    as the computation finishes, so a caller must take the future with
+    `get` before its first await and keep it (see `wait`).
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> (future, owner)
+
+    @staticmethod
+    def key(user_id, text, mode):
+        # The text is hashed so that keys stay small for long articles
+        return user_id, mode, hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """The running future for `key`, or None."""
+        entry = self._in_flight.get(key)
+        return entry[0] if entry is not None else None
+
+    def owner(self, key):
+        """The `owner` given to `add` (e.g. the message showing the result)."""
+        entry = self._in_flight.get(key)
+        return entry[1] if entry is not None else None
+
+    def add(self, key, future, owner=None):
+        """Register `future` (an asyncio future) until it is done."""
+        self._in_flight[key] = (future, owner)
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    def discard(self, key, future):
+        """Forget `future` (e.g. after it failed) unless another one replaced it."""
+        entry = self._in_flight.get(key)
+        if entry is not None and entry[0] is future:
+            del self._in_flight[key]
+
+    @staticmethod
+    async def wait(future):
+        """Await the result of a future returned by `get`."""
+        # shield: a cancelled duplicate must not cancel the original job
+        return await asyncio.shield(future)
+
+    def __len__(self):
+        return len(self._in_flight)
@@ -0,0 +1,186 @@
+
+# summary_cache.py
+# Content-addressed cache for generated summaries.
+# Users often re-press the mode buttons or forward the same article, and every
+# press used to re-run the full model. Final summaries are cached by a hash of
+# (model name, mode, normalized text); stage-1 chunk summaries are cached
+# separately by (model name, chunk token ids, chunk length bounds), so a long
+# article only re-runs the chunks whose summaries are not known yet.
+
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SummaryCache:
+    """
+    In-memory LRU cache with an optional SQLite file behind it.
+
+    Parameters
+    ----------
+    model_name : str
+        Name of the summarization model; part of every key so summaries of
+        different models never mix.
+    max_entries : int, optional (default=1024)
+        Maximum number of entries kept in memory (least recently used are evicted).
+    ttl : float or None, optional (default=86400)
+        Lifetime of an entry in seconds. None keeps entries forever.
+    path : str or None, optional (default=None)
+        SQLite file used as a persistent second level. None disables it.
+    max_disk_entries : int, optional (default=100000)
+        Maximum number of entries kept in the SQLite file.
+    """
+
+    # How many writes happen between two pruning passes of the SQLite file
+    PRUNE_EVERY = 100
+
+    def __init__(self, model_name, max_entries=1024, ttl=86400, path=None,
+                 max_disk_entries=100_000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+
+        # key -> (created_at, value)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        # Hit/miss counters per kind ("summary" and "chunk")
+        self.hits = {"summary": 0, "chunk": 0}
+        self.misses = {"summary": 0, "chunk": 0}
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache (created)")
+            self._db.commit()
+
+    # ---------------- final summaries ----------------
+
+    def summary_key(self, text, mode):
+        """Key of a final summary; `text` must already be normalized."""
+        return self._hash("summary", mode, text)
+
+    def get_summary(self, text, mode, count_miss=True):
+        # count_miss=False for a look-ahead whose miss the pipeline counts again
+        return self._get("summary", self.summary_key(text, mode), count_miss)
+
+    def put_summary(self, text, mode, summary):
+        self._put(self.summary_key(text, mode), summary)
+
+    # ---------------- stage-1 chunk summaries ----------------
+
+    def chunk_key(self, chunk_ids, min_length, max_length):
+        """Key of one chunk summary produced with the given length bounds."""
+        ids = ",".join(map(str, chunk_ids))
+        return self._hash("chunk", f"{min_length}-{max_length}", ids)
+
+    def get_chunk(self, chunk_ids, min_length, max_length):
+        return self._get("chunk", self.chunk_key(chunk_ids, min_length, max_length))
+
+    def put_chunk(self, chunk_ids, min_length, max_length, summary):
+        self._put(self.chunk_key(chunk_ids, min_length, max_length), summary)
+
+    # ---------------- statistics ----------------
+
+    def stats(self):
+        """Hit/miss counters and the number of entries held in memory."""
+        with self._lock:
+            out = {"entries": len(self._memory)}
+            for kind in self.hits:
+                hits, misses = self.hits[kind], self.misses[kind]
+                total = hits + misses
+                out[kind] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / total if total else 0.0,
+                }
+            return out
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------------- internals ----------------
+
+    def _hash(self, kind, variant, payload):
+        digest = hashlib.sha256()
+        for part in (kind, self.model_name, variant, payload):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def _get(self, kind, key, count_miss=True):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[0], now):
+                del self._memory[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, value FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[0], now):
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+
+            if entry is None:
+                self.misses[kind] += count_miss
+                return None
+
+            self._memory.move_to_end(key)
+            self.hits[kind] += 1
+            return entry[1]
+
+    def _put(self, key, value):
+        entry = (time.time(), value)
+        with self._lock:
+            self._remember(key, entry)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, entry[0]),
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune_disk(entry[0])
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self, now):
+        # Drop expired rows, then the oldest rows above the size limit
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
@@ -1,4 +1,5 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -8,16 +9,184 @@ from telegram.ext import (
     filters,
 )
 from datetime import datetime
+import asyncio
+import math
+import os
+import time
 
 # --- NLP imports ---
-from direct_summarizer import summarize_direct
-from chunk_summarizer import summarize_chunked
-from length_router import is_long_text
-from model import tokenizer
+from pipeline import summarize_text
+from inference_pool import InferencePool, PoolSaturated
+from batcher import GenerationBatcher
+from summary_cache import SummaryCache
+from history_store import create_history_store
+from decoding import DecodingPolicy, FULL_PLAN
+from preprocess import normalize_persian_text
+from worker_fleet import WorkerFleet
+from rate_limit import RateLimiter, ConcurrencyCap, RequestCoalescer
+from model import MODEL_NAME, BACKEND, is_ready, warm_up
+import metrics
+
+
+# Per-user summary history (SQLite in WAL mode, bounded per user),
+# opened in main() so importing this module creates no files.
+# Use create_history_store("memory") for a non-persistent store.
+HISTORY_DB_PATH = "history.sqlite3"
+history_store = None
+
+# Number of forked worker processes sharing one copy of the model weights
+# (e.g. SUMMARIZER_WORKERS=32 on a 32-core box). 0 runs inference in threads
+# of the bot process.
+WORKER_PROCESSES = int(os.environ.get("SUMMARIZER_WORKERS", "0"))
+
+# Model inference runs here, outside the event loop, so one long summary
+# does not block the other chats. Several workers let concurrent short
+# texts reach the batcher below at the same time; with worker processes
+# every pool thread waits for one process.
+inference_pool = InferencePool(
+    max_workers=WORKER_PROCESSES or 8, max_queue=64, max_per_user=2
+)
+
+# Admission control: each user may start one summary every 10 seconds on
+# average (3 at once), at most MAX_IN_FLIGHT summaries are queued or running
+# over all users, and repeated identical requests share one computation.
+MAX_IN_FLIGHT = 48
+rate_limiter = RateLimiter(rate=0.1, burst=3)
+concurrency_cap = ConcurrencyCap(MAX_IN_FLIGHT)
+request_coalescer = RequestCoalescer()
+
+# Concurrent direct summaries of the same mode are decoded as one batch
+generation_batcher = GenerationBatcher(max_batch_size=8, max_wait_ms=10)
+
+# Beam widths are lowered when many jobs are queued or running (and when a
+# long text would not finish within the latency budget, in seconds)
+decoding_policy = DecodingPolicy(busy_queue=6, overloaded_queue=16, latency_budget=60)
+
+# Summaries of already seen (text, mode) pairs and stage-1 chunk summaries.
+# Set SUMMARY_CACHE_PATH to a file name (e.g. "summary_cache.sqlite3")
+# to keep the cache across restarts. Quantized backends produce slightly
+# different outputs, so the backend is part of the cache's model name.
+SUMMARY_CACHE_PATH = None
+summary_cache = SummaryCache(
+    f"{MODEL_NAME}/{BACKEND}", max_entries=1024, ttl=24 * 3600, path=SUMMARY_CACHE_PATH
+)
+
+worker_fleet = None
+if WORKER_PROCESSES:
+    worker_fleet = WorkerFleet(
+        num_workers=WORKER_PROCESSES, cache_path=SUMMARY_CACHE_PATH, decoding=decoding_policy
+    )
+
+
+# Local Prometheus endpoint (http://127.0.0.1:9464/metrics); 0 disables it.
+# SUMMARIZER_TRACING=1 also exports pipeline stages as OpenTelemetry spans.
+METRICS_PORT = int(os.environ.get("SUMMARIZER_METRICS_PORT", "9464"))
+TRACING = os.environ.get("SUMMARIZER_TRACING") == "1"
+
+
+def summarize_job(text, mode, progress, queue_depth, submitted):
+    """
+    Summarize one text in an inference pool thread and record its metrics.
 
+    Returns the summary and a dict with its "decoding" plan, "route",
+    "input_tokens" and "output_tokens".
+    """
 
-# In-memory user storage
-user_data_store = {}
+    started = time.monotonic()
+    metrics.QUEUE_SECONDS.observe(started - submitted, mode=mode)
+
+    def on_progress(event):
+        if event.kind == "final":
+            metrics.CHUNKS.observe(event.total)
+        progress(event)
+
+    try:
+        if worker_fleet is not None:
+            summary, info = worker_fleet.summarize(
+                text, mode, queue_depth=queue_depth, on_progress=on_progress
+            )
+        else:
+            info = {}
+            summary = summarize_text(
+                text, mode=mode,
+                cache=summary_cache, on_progress=on_progress, batcher=generation_batcher,
+                decoding=decoding_policy, queue_depth=queue_depth,
+                on_decoding=lambda plan: info.update(decoding=plan),
+                on_route=lambda route, num_tokens: info.update(
+                    route=route, input_tokens=num_tokens
+                ),
+                on_output=lambda num_tokens: info.update(output_tokens=num_tokens),
+            )
+    except Exception as exc:
+        metrics.ERRORS.inc(mode=mode, error=type(exc).__name__)
+        metrics.REQUESTS.inc(mode=mode, route="unknown", status="error")
+        raise
+
+    route = info.get("route", "unknown")
+    metrics.REQUEST_SECONDS.observe(time.monotonic() - started, mode=mode, route=route)
+    metrics.REQUESTS.inc(mode=mode, route=route, status="ok")
+    if info.get("input_tokens") is not None:
+        metrics.TOKENS_IN.observe(info["input_tokens"], route=route)
+    # Counted by the worker that made the summary
+    if info.get("output_tokens") is not None:
+        metrics.TOKENS_OUT.observe(info["output_tokens"], route=route)
+
+    return summary, info
+
+
+# Progressive message updates for long texts
+
+class ProgressMessage:
+    """
+    Edits the bot's message with partial chunk summaries while a long text
+    is summarized. Called from the inference thread with every
+    chunk_summarizer.ProgressEvent; the edits run on the bot's event loop.
+    """
+
+    # Telegram rate-limits message edits
+    MIN_INTERVAL = 1.5
+    # Telegram messages are limited to 4096 characters
+    MAX_CHARS = 3500
+
+    def __init__(self, query, loop):
+        self._query = query
+        self._loop = loop
+        self._parts = {}
+        self._last_edit = 0.0
+        self._pending = []
+
+    def __call__(self, event):
+        if event.kind != "chunk":
+            return
+
+        self._parts[event.index] = event.text
+
+        now = time.monotonic()
+        if now - self._last_edit < self.MIN_INTERVAL and event.done < event.total:
+            return
+        self._last_edit = now
+
+        partial = "\n\n".join(self._parts[i] for i in sorted(self._parts))
+        text = (
+            f"⏳ بخش {event.done} از {event.total} خلاصه شد:\n\n"
+            f"{partial[-self.MAX_CHARS:]}"
+        )
+        self._pending.append(
+            asyncio.run_coroutine_threadsafe(self._edit(text), self._loop)
+        )
+
+    async def _edit(self, text):
+        try:
+            await self._query.edit_message_text(text)
+        except TelegramError:
+            # e.g. "message is not modified" or a flood limit; the final
+            # summary replaces this message anyway
+            pass
+
+    async def flush(self):
+        """Wait for scheduled edits so none lands after the final summary."""
+        for future in self._pending:
+            await asyncio.wrap_future(future)
 
 
 # /start
@@ -29,17 +198,21 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+# /health
+
+async def health(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Answers immediately, even while the model is still loading
+    status = "ready" if is_ready() else "loading model"
+    await update.message.reply_text(f"ok | {status}")
+
+
 # Receive text
 
 async def receive_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
-    user_id = update.message.from_user.id
 
     context.user_data["current_text"] = text
 
-    if user_id not in user_data_store:
-        user_data_store[user_id] = []
-
     keyboard = [
         [
             InlineKeyboardButton("Short", callback_data="mode_short"),
@@ -70,23 +243,131 @@ async def handle_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text(" متنی برای خلاصه‌سازی یافت نشد.")
         return
 
-    # --- Summarization ---
-    if is_long_text(text, tokenizer):
-        summary = summarize_chunked(text, mode=mode)
-    else:
-        summary = summarize_direct(text, mode=mode)
-
-    # --- Save history ---
     user_id = query.from_user.id
+    message_id = query.message.message_id if query.message else None
+
+    # --- Same request already running (e.g. a repeated tap): share its result ---
+    # Take the future before any await: the key is removed when the job finishes
+    key = request_coalescer.key(user_id, text, mode)
+    running = request_coalescer.get(key)
+    if running is not None:
+        metrics.REQUESTS.inc(mode=mode, route="unknown", status="coalesced")
+        if request_coalescer.owner(key) == message_id:
+            # The running request updates this very message
+            return
+        await query.edit_message_text("⏳ همین درخواست در حال انجام است...")
+        try:
+            summary, _ = await request_coalescer.wait(running)
+        except Exception:
+            # The original request reports the error metrics
+            await show_error(query)
+            return
+        await show_summary(query, context, mode, summary)
+        return
+
+    # --- Already summarized: answered from the cache, no token is charged ---
+    cached = summary_cache.get_summary(normalize_persian_text(text), mode, count_miss=False)
+    if cached is not None:
+        metrics.REQUESTS.inc(mode=mode, route="cache", status="ok")
+        save_history(user_id, text, cached, mode, FULL_PLAN.label("cache"))
+        await show_summary(query, context, mode, cached)
+        return
+
+    # --- Admission control ---
+    # The global cap is checked first, so a rejected request costs the user no token
+    if not concurrency_cap.try_acquire():
+        metrics.REQUESTS.inc(mode=mode, route="unknown", status="rejected")
+        await query.edit_message_text(
+            "⏳ ربات در حال حاضر مشغول است، لطفاً کمی بعد دوباره تلاش کن."
+        )
+        return
+
+    wait = rate_limiter.acquire(user_id)
+    if wait:
+        concurrency_cap.release()
+        metrics.REQUESTS.inc(mode=mode, route="unknown", status="rate_limited")
+        await query.edit_message_text(
+            f"⏳ درخواست‌های زیادی فرستادی؛ {math.ceil(wait)} ثانیه دیگر دوباره تلاش کن."
+        )
+        return
+
+    try:
+        # Partial results of long texts are shown while the rest is summarized
+        progress = ProgressMessage(query, asyncio.get_running_loop())
+
+        # --- Summarization (runs in the inference pool) ---
+        try:
+            job, position = inference_pool.submit(
+                user_id, summarize_job, text, mode, progress,
+                queue_depth=inference_pool.queue_depth + inference_pool.running,
+                submitted=time.monotonic(),
+            )
+        except PoolSaturated:
+            metrics.REQUESTS.inc(mode=mode, route="unknown", status="rejected")
+            await query.edit_message_text(
+                "⏳ ربات در حال حاضر مشغول است، لطفاً کمی بعد دوباره تلاش کن."
+            )
+            return
+
+        request_coalescer.add(key, job, owner=message_id)
+
+        if position:
+            await query.edit_message_text(f"⏳ ربات مشغول است؛ نوبت شما: {position}")
+        else:
+            await query.edit_message_text("⏳ در حال خلاصه‌سازی...")
+
+        metrics.IN_FLIGHT.inc()
+        try:
+            summary, info = await job
+        except Exception:
+            # summarize_job already counted the error
+            request_coalescer.discard(key, job)
+            await progress.flush()
+            await show_error(query)
+            return
+        finally:
+            metrics.IN_FLIGHT.dec()
+        await progress.flush()
+    finally:
+        concurrency_cap.release()
+
+    plan = info.get("decoding")
+    save_history(
+        user_id, text, summary, mode,
+        plan.label(info.get("route")) if plan is not None else None,
+    )
+
+    await show_summary(query, context, mode, summary)
+
+
+def save_history(user_id, text, summary, mode, decoding):
     timestamp = datetime.now().strftime("%H:%M | %Y-%m-%d")
+    history_store.add(
+        user_id, text=text, summary=summary, mode=mode, time=timestamp,
+        decoding=decoding,
+    )
+
+
+async def show_error(query):
+    # The text is still in user_data, so any mode can be tried again
+    keyboard = [
+        [
+            InlineKeyboardButton("Short", callback_data="mode_short"),
+            InlineKeyboardButton("Medium", callback_data="mode_medium"),
+        ],
+        [
+            InlineKeyboardButton("Long", callback_data="mode_long"),
+            InlineKeyboardButton("Auto", callback_data="mode_auto"),
+        ],
+    ]
+
+    await query.edit_message_text(
+        "❌ خلاصه‌سازی با خطا مواجه شد؛ لطفاً دوباره تلاش کن.",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
 
-    user_data_store[user_id].append({
-        "text": text,
-        "summary": summary,
-        "mode": mode,
-        "time": timestamp
-    })
 
+async def show_summary(query, context, mode, summary):
     # --- Save last summary for navigation ---
     context.user_data["last_summary"] = summary
     context.user_data["last_mode"] = mode
@@ -150,34 +431,62 @@ async def back_to_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
-# Show history
+# Show history (one page at a time)
+
+HISTORY_PAGE_SIZE = 8
+
+# Telegram messages are limited to 4096 characters
+MAX_HISTORY_TEXT_CHARS = 2500
+
 
 async def show_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
     user_id = query.from_user.id
-    history = user_data_store.get(user_id, [])
 
-    if not history:
+    # "history" opens the first page, "history_<n>" page n
+    page = 0
+    if query.data.startswith("history_"):
+        page = int(query.data.replace("history_", ""))
+
+    total = history_store.count(user_id)
+
+    if not total:
         await query.edit_message_text("🕘 تاریخچه‌ای وجود ندارد.")
         return
 
+    pages = (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    page = min(max(page, 0), pages - 1)
+
+    # Only time and mode are loaded here; full texts are read on demand
     keyboard = []
-    for i, item in enumerate(history):
+    for item in history_store.page(user_id, page, page_size=HISTORY_PAGE_SIZE):
         keyboard.append([
             InlineKeyboardButton(
                 f"{item['time']} | {item['mode']}",
-                callback_data=f"hist_{i}",
+                callback_data=f"hist_{item['id']}",
             )
         ])
 
+    navigation = []
+    if page > 0:
+        navigation.append(
+            InlineKeyboardButton("◀️ جدیدتر", callback_data=f"history_{page - 1}")
+        )
+    if page < pages - 1:
+        navigation.append(
+            InlineKeyboardButton("قدیمی‌تر ▶️", callback_data=f"history_{page + 1}")
+        )
+    if navigation:
+        keyboard.append(navigation)
+
     keyboard.append([
         InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_summary")
     ])
 
     await query.edit_message_text(
-        "🕘 تاریخچه خلاصه‌ها:",
+        f"🕘 تاریخچه خلاصه‌ها (صفحه {page + 1} از {pages}):",
         reply_markup=InlineKeyboardMarkup(keyboard),
     )
 
@@ -189,9 +498,13 @@ async def show_history_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     user_id = query.from_user.id
-    index = int(query.data.replace("hist_", ""))
+    entry_id = int(query.data.replace("hist_", ""))
 
-    item = user_data_store[user_id][index]
+    item = history_store.get(user_id, entry_id)
+
+    if item is None:
+        await query.edit_message_text("🕘 این مورد در تاریخچه یافت نشد.")
+        return
 
     context.user_data["current_text"] = item["text"]
     context.user_data["last_summary"] = item["summary"]
@@ -202,9 +515,15 @@ async def show_history_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("🔙 بازگشت", callback_data="history")],
     ]
 
+    text = item["text"]
+    if len(text) > MAX_HISTORY_TEXT_CHARS:
+        text = text[:MAX_HISTORY_TEXT_CHARS] + " …"
+
+    decoding = f", {item['decoding']}" if item.get("decoding") else ""
+
     await query.edit_message_text(
-        f"📌 متن اصلی:\n{item['text']}\n\n"
-        f"✂️ خلاصه ({item['mode']}):\n{item['summary']}",
+        f"📌 متن اصلی:\n{text}\n\n"
+        f"✂️ خلاصه ({item['mode']}{decoding}):\n{item['summary']}",
         reply_markup=InlineKeyboardMarkup(keyboard),
     )
 
@@ -225,9 +544,37 @@ async def new_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Main
 
 def main():
-    app = ApplicationBuilder().token("YOUR_TELEGRAM_BOT_TOKEN").build()
+    global history_store
+    history_store = create_history_store(
+        "sqlite", path=HISTORY_DB_PATH, max_entries_per_user=200
+    )
+
+    # Worker processes are forked before the bot starts any threads
+    if worker_fleet is not None:
+        worker_fleet.start()
+
+    # Stage timings are only seen in this process (not inside worker processes)
+    metrics.record_stages()
+    metrics.watch_pool(inference_pool)
+    # Worker processes have their own caches; the one here only answers
+    # repeated requests before admission
+    if worker_fleet is None:
+        metrics.watch_cache(summary_cache)
+    if TRACING:
+        metrics.enable_tracing()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+
+    # concurrent_updates lets other chats be handled while a summary is pending
+    app = (
+        ApplicationBuilder()
+        .token("YOUR_TELEGRAM_BOT_TOKEN")
+        .concurrent_updates(True)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("health", health))
     app.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND, receive_text))
 
@@ -236,10 +583,15 @@ def main():
     app.add_handler(CallbackQueryHandler(
         back_to_summary, pattern="^back_to_summary$"))
 
-    app.add_handler(CallbackQueryHandler(show_history, pattern="^history$"))
+    app.add_handler(CallbackQueryHandler(show_history, pattern=r"^history(_\d+)?$"))
     app.add_handler(CallbackQueryHandler(show_history_item, pattern="^hist_"))
     app.add_handler(CallbackQueryHandler(new_summary, pattern="^new$"))
 
+    # Load the model in the background; the bot answers right away and
+    # the first summarization request waits for the load if needed
+    if worker_fleet is None:
+        warm_up(background=True)
+
     print("Bot is running...")
     app.run_polling()
 
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import benchmark  # noqa: E402
+import model  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def tiny():
+    """The benchmark's randomly initialized model, installed as the shared model."""
+    tokenizer, seq2seq = benchmark.build_tiny_model()
+    model.set_model(tokenizer, seq2seq)
+    return tokenizer, seq2seq
+
+
+@pytest.fixture(scope="session")
+def tokenizer(tiny):
+    return tiny[0]
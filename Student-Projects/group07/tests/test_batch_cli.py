@@ -0,0 +1,60 @@
+import json
+
+from batch_cli import Summarizer, read_documents, resume_point, run, skip_documents
+from summary_cache import SummaryCache
+
+LINES = [
+    '{"id": "d1", "text": "این کتاب خوب است."}',
+    '{bad json',
+    '{"id": "d3"}',
+    '{"id": "d4", "text": null}',
+    '[1, 2]',
+    '',
+    '{"text": "کتاب را می خوانم."}',
+]
+
+
+def corpus(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_unusable_lines_are_reported_under_their_id(tmp_path):
+    documents = list(read_documents(corpus(tmp_path)))
+
+    assert [doc_id for doc_id, _ in documents] == ["d1", 2, "d3", "d4", 5, 7]
+    assert documents[0][1] == "این کتاب خوب است."
+    assert documents[5][1] == "کتاب را می خوانم."
+    for doc_id, text in documents[1:5]:
+        assert isinstance(text, ValueError)
+
+
+def test_error_records_keep_the_document_id():
+    record = Summarizer("short", cache=None)("d3", ValueError("'text' is missing or not a string"))
+    assert record == {"id": "d3", "mode": "short", "error": "ValueError: 'text' is missing or not a string"}
+
+
+def test_run_writes_every_line_and_resumes(tiny, tmp_path):
+    path = corpus(tmp_path)
+    output_path = tmp_path / "out.jsonl"
+    summarize = Summarizer("short", SummaryCache("tiny"))
+
+    documents = read_documents(path)
+    first_two = [next(documents), next(documents)]
+    with open(output_path, "a", encoding="utf-8") as output:
+        run(iter(first_two), summarize, output, workers=2, window=4, sync_every=1, report_every=100)
+
+    # Resume after the two records already written
+    done, last_id = resume_point(str(output_path))
+    assert (done, last_id) == (2, 2)
+    documents = skip_documents(read_documents(path), done, last_id)
+    with open(output_path, "a", encoding="utf-8") as output:
+        written, errors = run(documents, summarize, output, workers=2, window=4,
+                              sync_every=1, report_every=100, done=done)
+    assert (written, errors) == (4, 3)
+
+    records = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert [r["id"] for r in records] == ["d1", 2, "d3", "d4", 5, 7]
+    assert ["error" in r for r in records] == [False, True, True, True, True, False]
+    assert records[0]["route"] == "direct" and records[0]["summary"]
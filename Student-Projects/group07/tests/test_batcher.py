@@ -0,0 +1,87 @@
+import pytest
+
+from batcher import GenerationBatcher
+from benchmark import make_corpus
+from document import prepare_document
+
+SETTINGS = dict(min_length=5, max_length=20, num_beams=1, early_stopping=False)
+
+
+@pytest.fixture
+def generate_calls(tiny, monkeypatch):
+    # Batch sizes of every model.generate call
+    seq2seq = tiny[1]
+    calls = []
+    original = seq2seq.generate
+
+    def generate(input_ids, **kwargs):
+        calls.append(len(input_ids))
+        return original(input_ids, **kwargs)
+
+    monkeypatch.setattr(seq2seq, "generate", generate)
+    return calls
+
+
+def documents(tokenizer, n):
+    return [prepare_document(make_corpus(10 + 7 * i, seed=i), tokenizer).token_ids for i in range(n)]
+
+
+def test_concurrent_requests_share_one_generate_call(tokenizer, generate_calls):
+    docs = documents(tokenizer, 4)
+
+    alone = GenerationBatcher(max_batch_size=1, max_wait_ms=0)
+    expected = [alone.generate(ids, **SETTINGS) for ids in docs]
+    alone.close()
+    generate_calls.clear()
+
+    batcher = GenerationBatcher(max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(ids, **SETTINGS) for ids in docs]
+    results = [f.result(timeout=60) for f in futures]
+    batcher.close()
+
+    assert generate_calls == [4]
+    # Every caller gets the summary of its own input, as without batching
+    assert results == expected
+
+
+def test_requests_with_other_settings_are_not_mixed(tokenizer, generate_calls):
+    docs = documents(tokenizer, 4)
+    batcher = GenerationBatcher(max_batch_size=8, max_wait_ms=200)
+    futures = [
+        batcher.submit(ids, **dict(SETTINGS, max_length=20 + 10 * (i % 2)))
+        for i, ids in enumerate(docs)
+    ]
+    for future in futures:
+        future.result(timeout=60)
+    batcher.close()
+
+    assert sorted(generate_calls) == [2, 2]
+
+
+def test_batches_are_capped(tokenizer, generate_calls):
+    docs = documents(tokenizer, 5)
+    batcher = GenerationBatcher(max_batch_size=2, max_wait_ms=200)
+    for future in [batcher.submit(ids, **SETTINGS) for ids in docs]:
+        future.result(timeout=60)
+    batcher.close()
+
+    assert max(generate_calls) <= 2
+    assert sum(generate_calls) == 5
+
+
+def test_errors_reach_every_request_of_the_batch(tokenizer, tiny, monkeypatch):
+    def fail(input_ids, **kwargs):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(tiny[1], "generate", fail)
+    batcher = GenerationBatcher(max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit(ids, **SETTINGS) for ids in documents(tokenizer, 3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(timeout=60)
+    batcher.close()
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        GenerationBatcher(max_batch_size=0)
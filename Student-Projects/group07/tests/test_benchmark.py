@@ -0,0 +1,81 @@
+import json
+import sys
+
+import pytest
+
+import benchmark as bench
+import model
+from chunk_summarizer import summarize_chunked
+from direct_summarizer import summarize_direct
+from document import prepare_document
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+needs_pytest_benchmark = pytest.mark.skipif(
+    pytest_benchmark is None, reason="pip install pytest-benchmark"
+)
+
+# Small cases of the `--tiny` configuration: (path, mode, words)
+CASES = [
+    ("direct", "short", 150),
+    ("direct", "auto", 150),
+    ("chunked", "short", 1500),
+    ("chunked", "auto", 1500),
+]
+
+
+@pytest.mark.parametrize("path, mode, words", CASES)
+def test_run_case_reports_latency_and_stages(tiny, path, mode, words):
+    result = bench.run_case(path, bench.make_corpus(words), mode, repeat=1, warmup=0)
+
+    assert result["path"] == path and result["mode"] == mode
+    assert result["latency_mean"] > 0 and result["tokens_per_sec"] > 0
+    assert result["rss_mb"] > 0 and result["peak_rss_mb"] > 0
+
+    expected = {"normalize", "tokenize", "decode"}
+    expected |= {"direct_generate"} if path == "direct" else {"stage1_generate", "stage2_generate"}
+    assert expected <= set(result["stages"])
+    assert ("auto_length" in result) == (path == "direct" and mode == "auto")
+
+
+def test_cli_writes_json_and_detects_regressions(tiny, tmp_path, monkeypatch, capsys):
+    baseline = tmp_path / "baseline.json"
+    args = ["benchmark.py", "--tiny", "--paths", "direct", "--modes", "short",
+            "--lengths", "150", "--repeat", "1"]
+    try:
+        monkeypatch.setattr(sys, "argv", args + ["--json", str(baseline)])
+        bench.main()
+
+        report = json.loads(baseline.read_text(encoding="utf-8"))
+        assert report["model"] == "tiny-random-bert2bert"
+        assert [bench.case_key(r) for r in report["results"]] == ["direct/short/150"]
+
+        # A baseline 1000 times faster makes the run a regression
+        for result in report["results"]:
+            result["latency_mean"] /= 1000
+        baseline.write_text(json.dumps(report), encoding="utf-8")
+        monkeypatch.setattr(sys, "argv", args + ["--compare", str(baseline)])
+        with pytest.raises(SystemExit) as exit_info:
+            bench.main()
+        assert exit_info.value.code == 1
+        assert "REGRESSION" in capsys.readouterr().out
+    finally:
+        # --tiny installs its own model; restore the shared one
+        model.set_model(*tiny)
+
+
+# pytest-benchmark entries (skipped without the plugin), e.g.
+#     pytest tests/test_benchmark.py --benchmark-only --benchmark-autosave
+#     pytest tests/test_benchmark.py --benchmark-only --benchmark-compare
+
+@needs_pytest_benchmark
+@pytest.mark.parametrize("path, mode, words", CASES)
+def test_speed(benchmark, tiny, path, mode, words):
+    doc = prepare_document(bench.make_corpus(words), tiny[0])
+    summarize = summarize_direct if path == "direct" else summarize_chunked
+    # A fixed number of rounds keeps the suite fast with the plugin installed
+    summary = benchmark.pedantic(summarize, args=(doc, mode), rounds=3, warmup_rounds=1)
+    assert summary
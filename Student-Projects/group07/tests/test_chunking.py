@@ -0,0 +1,105 @@
+import pytest
+
+from benchmark import make_corpus
+from chunk_summarizer import (
+    MODEL_MAX_TOKENS,
+    chunk_document,
+    group_summaries,
+    iter_summarize_chunked,
+    sentence_boundaries,
+    split_to_sentence_chunks,
+)
+from decoding import DecodingPlan
+from document import prepare_document
+
+BUDGET = MODEL_MAX_TOKENS - 2
+
+
+def covered(spans):
+    return sorted({i for start, end in spans for i in range(start, end)})
+
+
+@pytest.mark.parametrize("max_tokens", [10, 25, 450])
+def test_chunks_cover_the_text_within_the_budget(max_tokens):
+    boundaries = [3, 9, 17, 30, 31, 52, 60, 88, 90]
+    spans = split_to_sentence_chunks(100, boundaries, max_tokens=max_tokens)
+
+    assert covered(spans) == list(range(100))
+    assert all(0 < end - start <= max_tokens for start, end in spans)
+    # Without overlap the chunks follow each other
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+
+
+def test_chunks_end_at_sentence_ends():
+    # No sentence is longer than max_tokens
+    boundaries = [3, 9, 17, 30, 31, 52, 60, 80, 90]
+    spans = split_to_sentence_chunks(100, boundaries, max_tokens=25)
+    ends = set(boundaries) | {100}
+    assert all(end in ends for _, end in spans)
+    assert spans == [(0, 17), (17, 31), (31, 52), (52, 60), (60, 80), (80, 100)]
+
+
+def test_long_sentences_fall_back_to_windows():
+    spans = split_to_sentence_chunks(95, [5, 95], max_tokens=20)
+    assert covered(spans) == list(range(95))
+    assert all(end - start <= 20 for start, end in spans)
+    assert (0, 5) in spans
+
+
+def test_overlap_repeats_whole_sentences():
+    boundaries = list(range(10, 101, 10))
+    spans = split_to_sentence_chunks(100, boundaries, max_tokens=30, overlap=10)
+
+    assert covered(spans) == list(range(100))
+    assert all(end - start <= 30 for start, end in spans)
+    for previous, current in zip(spans, spans[1:]):
+        assert current[0] == previous[1] - 10
+
+
+def test_chunk_document_spans_match_the_token_ids(tokenizer):
+    doc = prepare_document(make_corpus(1500), tokenizer)
+    spans, chunks = chunk_document(doc, tokenizer, max_tokens=120)
+
+    assert covered(spans) == list(range(len(doc.token_ids)))
+    assert chunks == [doc.token_ids[start:end] for start, end in spans]
+    assert set(end for _, end in spans[:-1]) <= set(sentence_boundaries(doc, tokenizer))
+
+
+@pytest.mark.parametrize("sizes", [[300, 300, 300], [600, 20, 600], [255] * 9, [100] * 20, [510, 510]])
+def test_groups_fit_the_model_input(sizes):
+    pieces = [[i] * size for i, size in enumerate(sizes)]
+    groups = group_summaries(pieces, max_tokens=BUDGET, fan_out=8)
+
+    assert all(len(group) <= BUDGET for group in groups)
+    assert len(groups) < len(pieces)
+
+
+def test_groups_keep_order_and_fan_out():
+    pieces = [[i] * 50 for i in range(20)]
+    groups = group_summaries(pieces, max_tokens=BUDGET, fan_out=4)
+
+    assert [len(group) for group in groups] == [200] * 5
+    assert [token for group in groups for token in group] == [t for p in pieces for t in p]
+
+
+def test_pairs_of_half_budget_summaries_are_not_cut():
+    pieces = [[i] * (BUDGET // 2) for i in range(3)] + [[9] * 300]
+    groups = group_summaries(pieces, max_tokens=BUDGET)
+    assert groups[0] == pieces[0] + pieces[1]
+
+
+def test_group_fan_out_must_merge():
+    with pytest.raises(ValueError):
+        group_summaries([[1], [2]], fan_out=1)
+
+
+def test_long_text_reduces_to_one_summary(tiny):
+    tokenizer = tiny[0]
+    doc = prepare_document(make_corpus(6000), tokenizer)
+    events = list(iter_summarize_chunked(doc, "auto", decoding=DecodingPlan.for_level("greedy")))
+
+    kinds = [event.kind for event in events]
+    assert kinds[-1] == "final" and kinds.count("final") == 1
+    assert "reduce" in kinds
+    num_chunks = kinds.count("chunk")
+    assert events[-1].total == num_chunks
@@ -0,0 +1,13 @@
+from decoding import FULL_PLAN, DecodingPlan
+
+
+def test_label_follows_the_route():
+    assert FULL_PLAN.label("direct") == "full (5 beams)"
+    assert FULL_PLAN.label("chunked") == "full (4/5 beams)"
+    assert FULL_PLAN.label("cache") == "full (cached)"
+
+
+def test_label_of_degraded_plans():
+    assert DecodingPlan.for_level("reduced").label("chunked") == "reduced (2 beams)"
+    assert DecodingPlan.for_level("greedy").label("direct") == "greedy (1 beam)"
+    assert DecodingPlan.for_level("reduced", cheap_intermediate=True).label("chunked") == "reduced (1/2 beams)"
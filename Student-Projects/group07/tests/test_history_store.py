@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+from history_store import create_history_store
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = create_history_store("sqlite", path=str(tmp_path / "history.sqlite3"), max_entries_per_user=5)
+    else:
+        store = create_history_store("memory", max_entries_per_user=5)
+    yield store
+    store.close()
+
+
+def add(store, user_id, n):
+    return [
+        store.add(user_id, text=f"text {i}", summary=f"summary {i}", mode="short", time=f"t{i}")
+        for i in range(n)
+    ]
+
+
+def test_pages_are_newest_first(store):
+    ids = add(store, 1, 5)
+    add(store, 2, 3)
+
+    assert store.count(1) == 5
+    assert [e["id"] for e in store.page(1, 0, page_size=2)] == ids[::-1][:2]
+    assert [e["id"] for e in store.page(1, 1, page_size=2)] == ids[::-1][2:4]
+    assert [e["id"] for e in store.page(1, 2, page_size=2)] == ids[:1]
+    assert store.page(1, 3, page_size=2) == []
+    # Pages list time and mode only
+    assert set(store.page(1, 0)[0]) == {"id", "time", "mode"}
+
+
+def test_oldest_entries_are_dropped_above_the_cap(store):
+    ids = add(store, 1, 8)
+    assert store.count(1) == 5
+    assert [e["id"] for e in store.page(1, 0, page_size=10)] == ids[::-1][:5]
+    assert store.get(1, ids[0]) is None
+
+
+def test_get_is_per_user(store):
+    entry_id = store.add(1, text="متن", summary="خلاصه", mode="auto", time="t", decoding="full (5 beams)")
+    assert store.get(1, entry_id) == {
+        "id": entry_id, "time": "t", "mode": "auto",
+        "text": "متن", "summary": "خلاصه", "decoding": "full (5 beams)",
+    }
+    assert store.get(2, entry_id) is None
+    assert store.count(2) == 0
+
+
+def test_sqlite_history_survives_a_restart(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    store = create_history_store("sqlite", path=path)
+    entry_id = store.add(1, text="a", summary="b", mode="short", time="t")
+    store.close()
+
+    store = create_history_store("sqlite", path=path)
+    assert store.get(1, entry_id)["summary"] == "b"
+    store.close()
+
+
+def test_databases_without_the_decoding_column_are_migrated(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+        "time TEXT NOT NULL, mode TEXT NOT NULL, text TEXT NOT NULL, summary TEXT NOT NULL)"
+    )
+    db.execute("INSERT INTO history (user_id, time, mode, text, summary) VALUES (1, 't', 'short', 'a', 'b')")
+    db.commit()
+    db.close()
+
+    store = create_history_store("sqlite", path=path)
+    assert store.get(1, 1)["decoding"] is None
+    store.close()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_history_store("redis")
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from inference_pool import InferencePool, PoolSaturated
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_jobs_of_users_are_served_round_robin():
+    async def main():
+        pool = InferencePool(max_workers=1, max_queue=16, max_per_user=4)
+        gate = threading.Event()
+        order = []
+
+        def job(name):
+            gate.wait(5)
+            order.append(name)
+            return name
+
+        first, position = pool.submit("a", job, "a0")
+        assert position == 0
+        await asyncio.sleep(0.05)  # a0 is running
+
+        futures = [first]
+        for user, name in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1")]:
+            futures.append(pool.submit(user, job, name)[0])
+        assert pool.queue_depth == 5
+        assert pool.running == 1
+
+        gate.set()
+        assert await asyncio.gather(*futures) == ["a0", "a1", "a2", "a3", "b1", "c1"]
+        pool.shutdown()
+        return order
+
+    # One heavy user does not starve the others
+    assert run(main()) == ["a0", "a1", "b1", "c1", "a2", "a3"]
+
+
+def test_queue_positions():
+    async def main():
+        pool = InferencePool(max_workers=1, max_queue=16, max_per_user=4)
+        gate = threading.Event()
+        pool.submit("a", gate.wait, 5)
+        await asyncio.sleep(0.05)
+
+        positions = [pool.submit(user, gate.wait, 5)[1] for user in ["a", "a", "b"]]
+        gate.set()
+        pool.shutdown()
+        return positions
+
+    # b's first job runs after a's first waiting one
+    assert run(main()) == [1, 2, 2]
+
+
+def test_limits_raise_pool_saturated():
+    async def main():
+        pool = InferencePool(max_workers=1, max_queue=3, max_per_user=2)
+        gate = threading.Event()
+        pool.submit("a", gate.wait, 5)
+        await asyncio.sleep(0.05)
+
+        pool.submit("a", gate.wait, 5)
+        pool.submit("a", gate.wait, 5)
+        with pytest.raises(PoolSaturated):
+            pool.submit("a", gate.wait, 5)  # per-user limit
+
+        pool.submit("b", gate.wait, 5)
+        with pytest.raises(PoolSaturated):
+            pool.submit("c", gate.wait, 5)  # global limit
+        gate.set()
+        pool.shutdown()
+
+    run(main())
+
+
+def test_exceptions_reach_the_caller():
+    async def main():
+        pool = InferencePool(max_workers=2)
+
+        def fail():
+            raise RuntimeError("model failed")
+
+        with pytest.raises(RuntimeError, match="model failed"):
+            await pool.run("a", fail)
+        # The worker keeps serving jobs
+        assert await pool.run("a", lambda: 42) == 42
+        assert pool.running == 0 and pool.queue_depth == 0
+        pool.shutdown()
+
+    run(main())
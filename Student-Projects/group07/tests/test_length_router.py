@@ -0,0 +1,64 @@
+import pytest
+
+from benchmark import make_corpus
+from document import prepare_document
+from length_router import count_words_and_chars, estimate_token_range, is_long_text
+from preprocess import normalize_persian_text
+
+
+def token_count(text, tokenizer):
+    return len(tokenizer.encode(normalize_persian_text(text), add_special_tokens=False))
+
+
+def test_format_characters_are_not_words(tokenizer):
+    # U+200F (right-to-left mark) is dropped by the tokenizer
+    text = " ".join(["کتاب ‏"] * 300)
+    assert token_count(text, tokenizer) == 300
+
+    low, high = estimate_token_range(normalize_persian_text(text))
+    assert low <= 300 <= high
+    assert not is_long_text(text, tokenizer)
+
+
+def test_counts_of_printable_text():
+    assert count_words_and_chars("کتاب خوب است.") == (3, 11)
+    assert count_words_and_chars("کتاب ‏ \x07 است") == (2, 7)
+    assert count_words_and_chars("") == (0, 0)
+
+
+@pytest.mark.parametrize("num_words", [20, 380, 390, 395, 600, 3000])
+def test_estimate_brackets_the_token_count(tokenizer, num_words):
+    text = normalize_persian_text(make_corpus(num_words))
+    low, high = estimate_token_range(text)
+    assert low <= token_count(text, tokenizer) <= high
+
+
+@pytest.mark.parametrize("num_words", [20, 380, 390, 395, 600, 3000])
+def test_raw_text_is_routed_like_the_prepared_document(tokenizer, num_words):
+    text = make_corpus(num_words)
+    doc = prepare_document(text, tokenizer)
+
+    assert is_long_text(text, tokenizer) == (doc.num_tokens > 450)
+    assert is_long_text(doc, tokenizer) == (doc.num_tokens > 450)
+
+
+class CountingTokenizer:
+    """Records how many times the text is tokenized."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.calls = 0
+
+    def num_special_tokens_to_add(self):
+        return self.tokenizer.num_special_tokens_to_add()
+
+    def encode(self, text, **kwargs):
+        self.calls += 1
+        return self.tokenizer.encode(text, **kwargs)
+
+
+@pytest.mark.parametrize("num_words, long_text", [(20, False), (3000, True)])
+def test_clear_cases_are_routed_without_tokenizing(tokenizer, num_words, long_text):
+    counting = CountingTokenizer(tokenizer)
+    assert is_long_text(make_corpus(num_words), counting) == long_text
+    assert counting.calls == 0
@@ -0,0 +1,42 @@
+import metrics
+from metrics import Registry
+from summary_cache import SummaryCache
+
+
+def test_render_uses_the_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", ("mode",))
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(1, 5))
+    requests.inc(mode="short")
+    requests.inc(2, mode="short")
+    latency.observe(0.5)
+    latency.observe(3)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{mode="short"} 3' in lines
+    assert 'latency_seconds_bucket{le="1"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_sum 3.5" in lines
+
+
+def test_cache_lookups_are_a_counter(monkeypatch):
+    registry = Registry()
+    lookups = registry.counter(metrics.CACHE_LOOKUPS.name, metrics.CACHE_LOOKUPS.help,
+                               metrics.CACHE_LOOKUPS.labelnames)
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    monkeypatch.setattr(metrics, "CACHE_LOOKUPS", lookups)
+
+    cache = SummaryCache("tiny")
+    metrics.watch_cache(cache)
+    cache.put_summary("متن", "short", "خلاصه")
+    cache.get_summary("متن", "short")
+    cache.get_summary("متن دیگر", "short")
+
+    hit = 'summarizer_cache_lookups_total{kind="summary",result="hit"}'
+    assert "# TYPE summarizer_cache_lookups_total counter" in registry.render()
+    # Scrapes without new lookups leave the counter where it was
+    assert f"{hit} 1" in registry.render().splitlines()
+
+    cache.get_summary("متن", "short")
+    assert f"{hit} 2" in registry.render().splitlines()
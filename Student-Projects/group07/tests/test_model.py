@@ -0,0 +1,22 @@
+import os
+
+import model
+
+
+def test_onnx_exports_are_kept_per_model():
+    default = model.onnx_export_dir()
+    other = model.onnx_export_dir("/tmp/tiny-random-bert2bert")
+
+    assert default != other
+    # Under the module's directory whatever the working directory is
+    module_dir = os.path.dirname(os.path.abspath(model.__file__))
+    for path in (default, other):
+        assert os.path.isabs(path)
+        assert os.path.dirname(path) == model.ONNX_DIR
+        assert os.path.commonpath([path, module_dir]) == module_dir
+
+
+def test_unfinished_exports_have_no_source(tmp_path):
+    assert model._read_onnx_source(str(tmp_path)) is None
+    (tmp_path / model.ONNX_SOURCE_FILE).write_text("org/model\n", encoding="utf-8")
+    assert model._read_onnx_source(str(tmp_path)) == "org/model"
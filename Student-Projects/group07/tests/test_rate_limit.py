@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import rate_limit
+from rate_limit import ConcurrencyCap, RateLimiter, RequestCoalescer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    limiter = RateLimiter(rate=0.1, burst=3)
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(10)
+    # Other users have their own bucket
+    assert limiter.acquire("b") == 0
+
+    clock[0] += 10
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+
+
+def test_least_recent_buckets_are_dropped(clock):
+    limiter = RateLimiter(rate=0.1, burst=1, max_users=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("c")
+    # a's bucket was dropped and starts full again
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("c") > 0
+
+
+def test_concurrency_cap():
+    cap = ConcurrencyCap(2)
+    assert cap.try_acquire() and cap.try_acquire()
+    assert not cap.try_acquire()
+    cap.release()
+    assert cap.active == 1
+    assert cap.try_acquire()
+
+
+def test_coalesced_requests_share_the_result():
+    async def main():
+        coalescer = RequestCoalescer()
+        key = coalescer.key(1, "متن", "short")
+        assert key == coalescer.key(1, "متن", "short")
+        assert key != coalescer.key(1, "متن", "long")
+
+        job = asyncio.get_running_loop().create_future()
+        coalescer.add(key, job, owner=42)
+        assert coalescer.owner(key) == 42
+
+        running = coalescer.get(key)
+        waiter = asyncio.ensure_future(coalescer.wait(running))
+        await asyncio.sleep(0)
+        job.set_result("summary")
+
+        assert await waiter == "summary"
+        await asyncio.sleep(0)
+        # Finished keys are removed; the taken future still holds the result
+        assert coalescer.get(key) is None and len(coalescer) == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_cancel_the_job():
+    async def main():
+        coalescer = RequestCoalescer()
+        job = asyncio.get_running_loop().create_future()
+        coalescer.add("k", job)
+
+        waiter = asyncio.ensure_future(coalescer.wait(coalescer.get("k")))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert not job.cancelled()
+
+    asyncio.run(main())
+
+
+def test_failed_jobs_reach_waiters_and_are_discarded():
+    async def main():
+        coalescer = RequestCoalescer()
+        job = asyncio.get_running_loop().create_future()
+        coalescer.add("k", job)
+
+        waiter = asyncio.ensure_future(coalescer.wait(coalescer.get("k")))
+        await asyncio.sleep(0)
+        job.set_exception(RuntimeError("model failed"))
+        with pytest.raises(RuntimeError):
+            await waiter
+
+        # discard only forgets the future it was given
+        other = asyncio.get_running_loop().create_future()
+        coalescer.add("k", other)
+        coalescer.discard("k", job)
+        assert coalescer.get("k") is other
+        coalescer.discard("k", other)
+        assert coalescer.get("k") is None
+
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+from pipeline import summarize_text
+from preprocess import normalize_persian_text
+from summary_cache import SummaryCache
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SummaryCache("m", max_entries=2)
+    cache.put_summary("a", "short", "A")
+    cache.put_summary("b", "short", "B")
+    assert cache.get_summary("a", "short") == "A"  # b is now the oldest
+
+    cache.put_summary("c", "short", "C")
+    assert cache.get_summary("b", "short") is None
+    assert cache.get_summary("a", "short") == "A"
+    assert cache.get_summary("c", "short") == "C"
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["summary"]["hits"] == 3
+    assert cache.stats()["summary"]["misses"] == 1
+
+
+def test_keys_separate_modes_models_and_chunk_lengths():
+    cache = SummaryCache("m")
+    cache.put_summary("text", "short", "S")
+    assert cache.get_summary("text", "long") is None
+    assert SummaryCache("other").get_summary("text", "short") is None
+
+    cache.put_chunk([1, 2, 3], 40, 80, "chunk")
+    assert cache.get_chunk([1, 2, 3], 40, 80) == "chunk"
+    assert cache.get_chunk([1, 2, 3], 60, 120) is None
+    assert cache.get_chunk([1, 2], 40, 80) is None
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    import summary_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(summary_cache.time, "time", lambda: now[0])
+    cache = SummaryCache("m", ttl=60)
+    cache.put_summary("a", "short", "A")
+    now[0] += 61
+    assert cache.get_summary("a", "short") is None
+
+
+def test_sqlite_level_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SummaryCache("m", path=path)
+    cache.put_summary("a", "short", "A")
+    cache.close()
+
+    reopened = SummaryCache("m", path=path)
+    assert reopened.get_summary("a", "short") == "A"
+    reopened.close()
+
+
+def test_texts_equal_after_normalization_share_a_summary(tiny):
+    cache = SummaryCache("tiny")
+    # Arabic yeh/kaf and a half-space normalize to the same text
+    persian = "این کتاب خوب است. کتاب را می خوانم."
+    arabic = "اين كتاب خوب است. كتاب را می‌خوانم."
+    assert normalize_persian_text(persian) == normalize_persian_text(arabic)
+
+    routes = []
+    first = summarize_text(persian, "short", cache=cache, on_route=lambda r, n: routes.append(r))
+    second = summarize_text(arabic, "short", cache=cache, on_route=lambda r, n: routes.append(r))
+
+    assert second == first
+    assert routes == ["direct", "cache"]
@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import telegram_bot
+from history_store import create_history_store
+from inference_pool import InferencePool
+from rate_limit import RateLimiter
+from summary_cache import SummaryCache
+
+TEXT = "این کتاب خوب است. کتاب را می خوانم."
+
+
+class FakeQuery:
+    """The parts of a Telegram CallbackQuery used by handle_mode."""
+
+    def __init__(self, data, user_id=7, message_id=1):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id)
+        self.message = SimpleNamespace(message_id=message_id)
+        self.texts = []
+
+    async def answer(self):
+        pass
+
+    async def edit_message_text(self, text, reply_markup=None):
+        self.texts.append(text)
+
+
+@pytest.fixture
+def bot(tiny, monkeypatch):
+    monkeypatch.setattr(telegram_bot, "history_store", create_history_store("memory"))
+    monkeypatch.setattr(telegram_bot, "summary_cache", SummaryCache("tiny"))
+    monkeypatch.setattr(telegram_bot, "rate_limiter", RateLimiter(rate=0.1, burst=3))
+    # The pool's workers belong to the event loop of the test
+    monkeypatch.setattr(telegram_bot, "inference_pool", InferencePool(max_workers=2))
+    yield telegram_bot
+    telegram_bot.inference_pool.shutdown()
+
+
+async def tap(bot, mode, text=TEXT):
+    query = FakeQuery(f"mode_{mode}")
+    context = SimpleNamespace(user_data={"current_text": text})
+    await bot.handle_mode(SimpleNamespace(callback_query=query), context)
+    return query.texts[-1]
+
+
+def test_cached_summaries_cost_no_rate_token(bot):
+    async def main():
+        replies = [await tap(bot, "short") for _ in range(6)]
+        assert all(reply.startswith("✅") for reply in replies)
+        assert len(set(replies)) == 1
+
+        # Only the first tap ran the model: two tokens are left
+        assert (await tap(bot, "medium")).startswith("✅")
+        assert (await tap(bot, "long")).startswith("✅")
+        assert not (await tap(bot, "auto")).startswith("✅")
+
+    asyncio.run(main())
+    assert bot.history_store.count(7) == 8
+
+
+def test_failed_summary_shows_an_error(bot, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("model failed")
+
+    monkeypatch.setattr(bot, "summarize_text", fail)
+    assert asyncio.run(tap(bot, "short")).startswith("❌")
+    assert len(bot.request_coalescer) == 0
+    assert bot.concurrency_cap.active == 0
+    assert bot.history_store.count(7) == 0
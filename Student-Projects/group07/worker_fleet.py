@@ -0,0 +1,205 @@
+
+# worker_fleet.py
+# Pre-fork multi-process summarization workers.
+# One Python process runs one model instance and is GIL-bound around
+# tokenization and decoding glue, so a many-core CPU box stays mostly idle.
+# The WorkerFleet loads the model once in the parent process, moves its
+# weights into shared memory and forks N worker processes: every worker
+# reads the same physical weight pages (copy-on-write), so memory does not
+# grow with the number of workers. Jobs are served from a local process
+# pool queue; progress events of long texts are sent back to the parent.
+
+
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from model import BACKEND, get_tokenizer, get_model, is_ready
+
+
+# State of a worker process, set by _init_worker after the fork
+_worker = {}
+
+
+def _init_worker(torch_threads, cache_path, decoding, events):
+    # Each worker uses few intra-op threads: the fleet parallelizes over
+    # processes, and N workers x all cores would oversubscribe the CPU
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    from summary_cache import SummaryCache
+    from model import MODEL_NAME
+    # With a path, workers share the SQLite file; each keeps its own LRU in memory
+    cache = SummaryCache(f"{MODEL_NAME}/{BACKEND}", path=cache_path)
+
+    _worker.update(cache=cache, decoding=decoding, events=events)
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def _run_job(job_id, text, mode, queue_depth, report_progress):
+    # Runs inside a worker process
+    from pipeline import summarize_text
+
+    events = _worker["events"]
+    info = {}
+
+    def on_progress(event):
+        events.put((job_id, event))
+
+    try:
+        summary = summarize_text(
+            text, mode,
+            cache=_worker["cache"],
+            on_progress=on_progress if report_progress else None,
+            decoding=_worker["decoding"],
+            queue_depth=queue_depth,
+            on_decoding=lambda plan: info.update(decoding=plan),
+            on_route=lambda route, num_tokens: info.update(route=route, input_tokens=num_tokens),
+            on_output=lambda num_tokens: info.update(output_tokens=num_tokens),
+        )
+    finally:
+        if report_progress:
+            # Marks the end of this job's events
+            events.put((job_id, None))
+    return summary, info
+
+
+class WorkerFleet:
+    """
+    Pool of forked summarization processes sharing one copy of the weights.
+
+    Parameters
+    ----------
+    num_workers : int, optional
+        Number of worker processes (default: one per CPU core).
+    torch_threads : int, optional (default=1)
+        Intra-op threads of every worker.
+    cache_path : str, optional
+        SQLite file of a summary_cache.SummaryCache shared by all workers
+        (without it every worker has its own in-memory cache).
+    decoding : decoding.DecodingPolicy, optional
+        Decoding policy used by every worker.
+
+    Use `start()` once, before the process starts other threads (forking a
+    multi-threaded process is unsafe), then call `summarize(...)` from any
+    thread, e.g. through an InferencePool with `num_workers` threads.
+    """
+
+    def __init__(self, num_workers=None, torch_threads=1, cache_path=None, decoding=None):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.torch_threads = torch_threads
+        self.cache_path = cache_path
+        self.decoding = decoding
+
+        self._executor = None
+        self._events = None
+        self._listener = None
+        self._job_ids = itertools.count()
+        self._progress = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Load the model, share its weights and fork the workers."""
+        if self._executor is not None:
+            return
+
+        context = multiprocessing.get_context("fork")
+
+        # ONNX Runtime sessions are not fork-safe: every worker loads its own
+        if BACKEND != "onnx":
+            get_tokenizer()
+            model = get_model()
+            share_memory = getattr(model, "share_memory", None)
+            if share_memory is not None:
+                # Weights in shared memory stay shared even when a worker
+                # touches the pages holding them
+                share_memory()
+
+        self._events = context.SimpleQueue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.torch_threads, self.cache_path, self.decoding, self._events),
+        )
+
+        # With the fork start method all workers are created on the first
+        # submit; do it now, while this process has no other threads
+        list(self._executor.map(_ping, range(self.num_workers)))
+
+        self._listener = threading.Thread(
+            target=self._dispatch_events, name="fleet-events", daemon=True
+        )
+        self._listener.start()
+
+    def summarize(self, text, mode, queue_depth=0, on_progress=None):
+        """
+        Summarize `text` in a worker process (blocking).
+
+        Returns
+        -------
+        (str, dict)
+            The summary and what the pipeline reported about it:
+            {"decoding": DecodingPlan, "route": str, "input_tokens": int or None,
+            "output_tokens": int}.
+        """
+
+        if self._executor is None:
+            raise RuntimeError("WorkerFleet.start() must be called first")
+
+        job_id = next(self._job_ids)
+        finished = threading.Event()
+        if on_progress is not None:
+            with self._lock:
+                self._progress[job_id] = (on_progress, finished)
+
+        try:
+            future = self._executor.submit(
+                _run_job, job_id, text, mode, queue_depth, on_progress is not None
+            )
+            result = future.result()
+            # Deliver every progress event before the caller shows the result
+            if on_progress is not None:
+                finished.wait()
+            return result
+        finally:
+            with self._lock:
+                self._progress.pop(job_id, None)
+
+    def shutdown(self):
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True)
+        self._events.put(None)
+        self._listener.join()
+        self._executor = None
+
+    @property
+    def ready(self):
+        return self._executor is not None and (BACKEND == "onnx" or is_ready())
+
+    # ---------------- internals ----------------
+
+    def _dispatch_events(self):
+        # Forward progress events from the workers to their callbacks
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            job_id, event = item
+            with self._lock:
+                callback, finished = self._progress.get(job_id, (None, None))
+            if callback is None:
+                continue
+            if event is None:
+                finished.set()
+            else:
+                callback(event)